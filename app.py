@@ -1,17 +1,46 @@
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, send_file, flash, redirect, url_for, stream_with_context
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, quote
 import os
 import re
 from PIL import Image
 import io
+import json
 import base64
 import time
+import threading
 import hashlib
-from pathlib import Path
-from datetime import datetime
+import zlib
+from concurrent.futures import Future, wait
+from werkzeug.http import parse_date, unquote_etag
+from datetime import datetime, timezone
+from markupsafe import escape
 from services.data_loader import load_excel_and_compute
+from services.validation_pool import ValidationPool
+from services.http_pool import HTTPPool
+from services.page_fetcher import PageFetcher, CircuitBreaker
+from services.page_cache import PageCache, FetchedPage
+from services.collect_store import CollectStore, parse_batch
+from services.browser_pool import BrowserPool, BrowserPoolBusy, BrowserPoolUnavailable
+from services.request_policy import RequestPolicy, DEFAULT_BLOCK_TYPES, DEFAULT_BLOCK_DOMAINS
+from services.capture_store import CaptureStore, is_capturable
+from services.render_scroll import PageActivity, PhaseTimer, click_load_more, auto_scroll, reveal_lazy_images
+from services.metadata_cache import ImageMetaCache
+from services.candidates import CandidateCollector
+from services.css_fetcher import StylesheetFetcher
+from services.html_parser import parse_html, scan_page, serialize_html
+from services.scanner import scan_script, scan_css_backgrounds, scan_css_urls
+from services.proxy_cache import ProxyCache
+from services.http_ranges import (
+    parse_ranges, if_range_matches, range_response, not_satisfiable_response, RangeNotSatisfiable
+)
+from services.thumbnails import ThumbnailCache, normalize_params, render_thumbnail, OUTPUT_FORMATS as THUMB_FORMATS
+from services.image_proxy import (decode_proxy_url, encode_proxy_url, open_upstream, passthrough_headers, iter_body,
+                                  peek_body, ProxyTooLarge, PROXY_HEADERS, DOWNLOAD_HEADERS)
+from services.image_header import (
+    ImageHeaderReader, looks_like_image, is_image_content, needs_more_ranges, total_size_from_headers,
+    DEFAULT_PROBE_WINDOW, DEFAULT_MAX_BYTES
+)
 
 app = Flask(__name__)
 app.secret_key = 'dashboard_secret_key_2024'
@@ -23,13 +52,103 @@ try:
 except (OSError, PermissionError):
     pass  # 在只读文件系统中忽略错误
 DEFAULT_DATA_PATH = os.path.join(app.config['UPLOAD_FOLDER'], 'latest.xlsx')
-
-# 简单的内存收集器（仅当前进程内有效）
-collected_links = []
+# 图片并发验证：全局并发数、单主机并发数、整体截止时间（秒）
+app.config['VALIDATION_MAX_WORKERS'] = int(os.environ.get('VALIDATION_MAX_WORKERS', 16))
+app.config['VALIDATION_PER_HOST'] = int(os.environ.get('VALIDATION_PER_HOST', 4))
+app.config['VALIDATION_DEADLINE'] = float(os.environ.get('VALIDATION_DEADLINE', 30))
+# 上游连接池：保留连接池的主机数、每主机长连接数、每主机并发上限、重试次数与退避系数、keep-alive 空闲秒数、
+# 等待主机并发名额的最长秒数
+app.config['HTTP_POOL_HOSTS'] = int(os.environ.get('HTTP_POOL_HOSTS', 32))
+app.config['HTTP_POOL_MAXSIZE'] = int(os.environ.get('HTTP_POOL_MAXSIZE', 16))
+app.config['HTTP_POOL_PER_HOST'] = int(os.environ.get('HTTP_POOL_PER_HOST', 8))
+app.config['HTTP_POOL_RETRIES'] = int(os.environ.get('HTTP_POOL_RETRIES', 2))
+app.config['HTTP_POOL_BACKOFF'] = float(os.environ.get('HTTP_POOL_BACKOFF', 0.3))
+app.config['HTTP_POOL_KEEPALIVE'] = int(os.environ.get('HTTP_POOL_KEEPALIVE', 60))
+app.config['HTTP_POOL_ACQUIRE_TIMEOUT'] = float(os.environ.get('HTTP_POOL_ACQUIRE_TIMEOUT', 30))
+# 页面抓取重试：总截止时间、连接/读取超时、退避基数与上限、熔断阈值与熔断时长
+app.config['FETCH_DEADLINE'] = float(os.environ.get('FETCH_DEADLINE', 20))
+app.config['FETCH_CONNECT_TIMEOUT'] = float(os.environ.get('FETCH_CONNECT_TIMEOUT', 5))
+app.config['FETCH_READ_TIMEOUT'] = float(os.environ.get('FETCH_READ_TIMEOUT', 10))
+app.config['FETCH_BACKOFF_BASE'] = float(os.environ.get('FETCH_BACKOFF_BASE', 0.5))
+app.config['FETCH_BACKOFF_MAX'] = float(os.environ.get('FETCH_BACKOFF_MAX', 4))
+app.config['FETCH_BREAKER_THRESHOLD'] = int(os.environ.get('FETCH_BREAKER_THRESHOLD', 5))
+app.config['FETCH_BREAKER_RESET'] = float(os.environ.get('FETCH_BREAKER_RESET', 30))
+# 页面缓存：重复提取同一页面时复用，过期后用条件请求续期
+app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('PAGE_CACHE_SIZE', 100))
+app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 60))
+app.config['PAGE_CACHE_STALE_TTL'] = int(os.environ.get('PAGE_CACHE_STALE_TTL', 600))
+# 批量提取：单次请求最多的页面数、并发抓取的页面数、整批的截止时间（秒）
+# 每个页面的图片验证另有 VALIDATION_DEADLINE 的独立预算，从该页面解析完成时起算，但不超过整批截止时间
+app.config['BATCH_MAX_URLS'] = int(os.environ.get('BATCH_MAX_URLS', 50))
+app.config['BATCH_PAGE_WORKERS'] = int(os.environ.get('BATCH_PAGE_WORKERS', 4))
+app.config['BATCH_DEADLINE'] = float(os.environ.get('BATCH_DEADLINE', 300))
+# 图片代理：单张图片最大字节数（超出时拒绝或截断）
+app.config['PROXY_MAX_BYTES'] = int(os.environ.get('PROXY_MAX_BYTES', 20 * 1024 * 1024))
+# 图片代理的磁盘缓存：目录、正文总大小上限、有效期（秒）
+app.config['PROXY_CACHE_DIR'] = os.environ.get(
+    'PROXY_CACHE_DIR', os.path.join(app.config['UPLOAD_FOLDER'], 'proxy_cache'))
+app.config['PROXY_CACHE_MAX_BYTES'] = int(os.environ.get('PROXY_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+app.config['PROXY_CACHE_TTL'] = int(os.environ.get('PROXY_CACHE_TTL', 24 * 3600))
+# 缩略图变体的磁盘缓存：目录、总大小上限
+app.config['THUMB_CACHE_DIR'] = os.environ.get(
+    'THUMB_CACHE_DIR', os.path.join(app.config['UPLOAD_FOLDER'], 'thumb_cache'))
+app.config['THUMB_CACHE_MAX_BYTES'] = int(os.environ.get('THUMB_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# 手动模式收集的链接：SQLite 数据库路径、批量写入的条数与间隔（秒）
+app.config['COLLECT_DB'] = os.environ.get('COLLECT_DB', os.path.join(app.config['UPLOAD_FOLDER'], 'collected.sqlite3'))
+app.config['COLLECT_BATCH_SIZE'] = int(os.environ.get('COLLECT_BATCH_SIZE', 200))
+app.config['COLLECT_FLUSH_INTERVAL'] = float(os.environ.get('COLLECT_FLUSH_INTERVAL', 0.5))
+# 批量上报：解压后正文的最大字节数
+app.config['COLLECT_BATCH_MAX_BYTES'] = int(os.environ.get('COLLECT_BATCH_MAX_BYTES', 8 * 1024 * 1024))
+# 渲染模式的浏览器池：常驻浏览器数（即同时渲染的页面数）、每个浏览器渲染多少页后重启、
+# 最长存活秒数、内存上限（MB/浏览器）、请求排队加执行的超时秒数
+app.config['BROWSER_POOL_SIZE'] = int(os.environ.get('BROWSER_POOL_SIZE', 2))
+app.config['BROWSER_RECYCLE_AFTER'] = int(os.environ.get('BROWSER_RECYCLE_AFTER', 50))
+app.config['BROWSER_MAX_AGE'] = int(os.environ.get('BROWSER_MAX_AGE', 1800))
+app.config['BROWSER_MAX_RSS_MB'] = int(os.environ.get('BROWSER_MAX_RSS_MB', 1024))
+app.config['BROWSER_POOL_TIMEOUT'] = float(os.environ.get('BROWSER_POOL_TIMEOUT', 180))
+# 渲染模式的请求拦截：拦截的资源类型、拦截的域名（含子域名）、始终放行的域名（逗号分隔），
+# 以及是否拦截非同站的脚本
+app.config['RENDER_BLOCK_TYPES'] = os.environ.get('RENDER_BLOCK_TYPES', ','.join(DEFAULT_BLOCK_TYPES))
+app.config['RENDER_BLOCK_DOMAINS'] = os.environ.get('RENDER_BLOCK_DOMAINS', ','.join(DEFAULT_BLOCK_DOMAINS))
+app.config['RENDER_ALLOW_DOMAINS'] = os.environ.get('RENDER_ALLOW_DOMAINS', '')
+app.config['RENDER_BLOCK_THIRD_PARTY_SCRIPTS'] = os.environ.get('RENDER_BLOCK_THIRD_PARTY_SCRIPTS', '0') == '1'
+# 渲染模式截获图片的本地保存（static/captured）：目录总大小上限、写队列长度、
+# 渲染结束后等待写完的最长秒数
+app.config['CAPTURE_MAX_BYTES'] = int(os.environ.get('CAPTURE_MAX_BYTES', 512 * 1024 * 1024))
+app.config['CAPTURE_QUEUE_SIZE'] = int(os.environ.get('CAPTURE_QUEUE_SIZE', 256))
+app.config['CAPTURE_WAIT_TIMEOUT'] = float(os.environ.get('CAPTURE_WAIT_TIMEOUT', 10))
+# 图片元数据缓存：内存 LRU 条目数、有效期（秒）、磁盘层路径（置空则只用内存）
+app.config['IMAGE_META_CACHE_SIZE'] = int(os.environ.get('IMAGE_META_CACHE_SIZE', 5000))
+app.config['IMAGE_META_CACHE_TTL'] = int(os.environ.get('IMAGE_META_CACHE_TTL', 24 * 3600))
+app.config['IMAGE_META_CACHE_DB'] = os.environ.get(
+    'IMAGE_META_CACHE_DB', os.path.join(app.config['UPLOAD_FOLDER'], 'image_meta.sqlite3'))
+
+# 手动模式收集器：持久化存储，多个 worker 进程共享
+collect_store = CollectStore(
+    app.config['COLLECT_DB'],
+    batch_size=app.config['COLLECT_BATCH_SIZE'],
+    flush_interval=app.config['COLLECT_FLUSH_INTERVAL'],
+)
 
 class ContentExtractor:
-    def __init__(self):
-        self.session = requests.Session()
+    # 可以缓存为“无效”的上游状态码：资源确定不存在；403、429、5xx 等可能是临时失败，不缓存
+    NEGATIVE_CACHE_STATUSES = frozenset({404, 410})
+    # 批量提取时页面池在截止时间之后多等的秒数，用于收回截止时刻仍在验证的页面
+    BATCH_GRACE = 2.0
+
+    def __init__(self, max_workers=16, per_host=4, deadline=30.0, meta_cache=None, page_workers=4,
+                 http_pool=None, fetch_options=None, page_cache=None, batch_deadline=300.0):
+        self.validation_pool = ValidationPool(max_workers=max_workers, per_host=per_host, deadline=deadline)
+        # 批量提取时的页面抓取池：并发较低，同一主机最多 2 个页面同时抓取
+        self.page_pool = ValidationPool(max_workers=page_workers, per_host=2, deadline=deadline)
+        self.batch_deadline = float(batch_deadline)
+        self.meta_cache = meta_cache or ImageMetaCache()
+        # 尺寸探测：每个 Range 窗口的大小与单张图片最多读取的字节数
+        self.probe_window = DEFAULT_PROBE_WINDOW
+        self.probe_max_bytes = DEFAULT_MAX_BYTES
+        # 上游连接池：所有 Flask 线程、验证线程与渲染模式共享同一个 Session
+        self.http_pool = http_pool or HTTPPool()
+        self.session = self.http_pool.mount(requests.Session())
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
@@ -42,193 +161,91 @@ class ContentExtractor:
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0',
         })
+        self.css_fetcher = StylesheetFetcher(self.session)
+        # 页面抓取由 PageFetcher 自行重试并控制总截止时间，使用不在连接池内重试的会话（共用连接池与请求头）
+        self.page_session = self.http_pool.mount(requests.Session(), retries=False)
+        self.page_session.headers = self.session.headers
+        # 页面抓取重试引擎；fetch_options 为 PageFetcher 的参数（截止时间、超时、退避、熔断器）
+        self.page_fetcher = PageFetcher(self.page_session, **(fetch_options or {}))
+        self.page_cache = page_cache or PageCache()
     
-    def extract_text_content(self, soup, url):
-        """提取网页的文字内容"""
-        text_content = {
-            'title': '',
-            'main_content': '',
-            'headings': [],
-            'paragraphs': [],
-            'lists': [],
-            'links': [],
-            'full_text': ''
+    def fetch_page(self, url, cookie: str = None):
+        """抓取页面，返回 FetchedPage
+
+        短期缓存命中时直接复用；缓存过期但有 ETag/Last-Modified 时发条件请求，304 则续期。
+        """
+        key = self.page_cache.make_key(url, cookie)
+        cached, fresh = self.page_cache.get(key)
+        if cached is not None and fresh:
+            return cached.copy('HIT')
+
+        conditional = {}
+        if cached is not None:
+            if cached.etag:
+                conditional['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                conditional['If-Modified-Since'] = cached.last_modified
+
+        # 重试引擎：总截止时间内按不同请求头方案尝试，带退避与熔断
+        response = self.page_fetcher.fetch(url, cookie=cookie, headers=conditional)
+        if response.status_code == 304 and cached is not None:
+            self.page_cache.refresh(key)
+            return cached.copy('REVALIDATED')
+
+        page = FetchedPage.from_response(url, response)
+        if 'image' not in page.content_type:
+            self.page_cache.put(key, page)
+        return page
+
+    def build_debug_info(self, page, root, scan):
+        """调试信息：直接使用已抓取的页面与解析树，不再重新请求"""
+        html_text = serialize_html(root)
+        return {
+            'status_code': page.status_code,
+            'content_length': len(page.content),
+            'encoding': page.encoding,
+            'page_cache': page.cache_status,
+            'title': scan.title if scan.title is not None else 'No title',
+            'img_tags_count': scan.img_tags_count,
+            'has_scripts': scan.script_tags_count > 0,
+            'sample_html': html_text[:1000] + '...' if len(html_text) > 1000 else html_text
         }
-        
-        try:
-            # 提取标题
-            title_tag = soup.find('title')
-            if title_tag:
-                text_content['title'] = title_tag.get_text().strip()
-            
-            # 提取主内容区域（优先选择article, main, content等语义化标签）
-            main_content_selectors = [
-                'article', 'main', '[role="main"]', '.content', '.main-content', 
-                '.post-content', '.article-content', '.entry-content',
-                '#content', '#main', '.container', 'body'
-            ]
-            
-            main_element = None
-            for selector in main_content_selectors:
-                main_element = soup.select_one(selector)
-                if main_element:
-                    break
-            
-            if not main_element:
-                main_element = soup.find('body')
-            
-            if main_element:
-                # 提取标题
-                headings = main_element.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-                for heading in headings:
-                    heading_text = heading.get_text().strip()
-                    if heading_text:
-                        text_content['headings'].append({
-                            'level': heading.name,
-                            'text': heading_text
-                        })
-                
-                # 提取段落
-                paragraphs = main_element.find_all('p')
-                for p in paragraphs:
-                    p_text = p.get_text().strip()
-                    if p_text and len(p_text) > 10:  # 过滤太短的段落
-                        text_content['paragraphs'].append(p_text)
-                
-                # 提取列表
-                lists = main_element.find_all(['ul', 'ol'])
-                for list_elem in lists:
-                    list_items = []
-                    for li in list_elem.find_all('li'):
-                        li_text = li.get_text().strip()
-                        if li_text:
-                            list_items.append(li_text)
-                    if list_items:
-                        text_content['lists'].append({
-                            'type': list_elem.name,
-                            'items': list_items
-                        })
-                
-                # 提取链接
-                links = main_element.find_all('a', href=True)
-                for link in links:
-                    link_text = link.get_text().strip()
-                    href = link.get('href')
-                    if link_text and href:
-                        # 转换为绝对URL
-                        absolute_url = urljoin(url, href)
-                        text_content['links'].append({
-                            'text': link_text,
-                            'url': absolute_url
-                        })
-                
-                # 提取完整文本内容
-                # 移除脚本和样式标签
-                for script in main_element(["script", "style", "nav", "header", "footer", "aside"]):
-                    script.decompose()
-                
-                # 获取纯文本
-                full_text = main_element.get_text()
-                # 清理文本
-                lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-                text_content['full_text'] = '\n'.join(lines)
-                
-                # 生成主要内容的摘要
-                if text_content['paragraphs']:
-                    text_content['main_content'] = '\n\n'.join(text_content['paragraphs'][:5])  # 取前5个段落
-                elif text_content['full_text']:
-                    # 如果没有段落，从完整文本中提取前500字符
-                    text_content['main_content'] = text_content['full_text'][:500] + '...' if len(text_content['full_text']) > 500 else text_content['full_text']
-        
-        except Exception as e:
-            print(f"文字提取错误: {e}")
-        
-        return text_content
 
-    def extract_images_from_url(self, url, cookie: str = None):
-        """从URL提取所有图片链接"""
+    def extract_images_from_url(self, url, cookie: str = None, debug: bool = False):
+        """从URL提取所有图片链接，返回 {'images', 'text_content'}，失败时返回 {'error'}；
+        debug 为真时结果中附带 debug 信息"""
         try:
-            # 尝试多种请求方式
-            response = None
-            for attempt in range(3):
-                try:
-                    if attempt == 0:
-                        # 第一次尝试：标准请求
-                        headers = self.session.headers.copy()
-                        if cookie:
-                            headers['Cookie'] = cookie
-                        response = self.session.get(url, headers=headers, timeout=10)
-                    elif attempt == 1:
-                        # 第二次尝试：添加更多浏览器头
-                        headers = self.session.headers.copy()
-                        headers.update({
-                            'Referer': 'https://www.google.com/',
-                            'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                            'Sec-Ch-Ua-Mobile': '?0',
-                            'Sec-Ch-Ua-Platform': '"macOS"'
-                        })
-                        if cookie:
-                            headers['Cookie'] = cookie
-                        response = self.session.get(url, headers=headers, timeout=10)
-                    else:
-                        # 第三次尝试：使用不同的User-Agent
-                        headers = self.session.headers.copy()
-                        headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                        if cookie:
-                            headers['Cookie'] = cookie
-                        response = self.session.get(url, headers=headers, timeout=10)
-                    
-                    if response.status_code == 200:
-                        break
-                    elif response.status_code == 403:
-                        if attempt < 2:  # 还有重试机会
-                            continue
-                        else:
-                            return {'error': f'访问被拒绝 (403 Forbidden)。这可能是由于网站的反爬虫保护。请尝试：\n1. 使用直接的图片链接\n2. 尝试其他网站\n3. 稍后再试'}
-                    else:
-                        response.raise_for_status()
-                        
-                except requests.exceptions.RequestException as e:
-                    if attempt == 2:  # 最后一次尝试
-                        raise e
-                    continue
-            
-            if not response:
-                return {'error': '无法连接到服务器'}
-            
+            page = self.fetch_page(url, cookie=cookie)
+            if page.status_code == 403:
+                return {'error': f'访问被拒绝 (403 Forbidden)。这可能是由于网站的反爬虫保护。请尝试：\n1. 使用直接的图片链接\n2. 尝试其他网站\n3. 稍后再试'}
+            if page.status_code >= 400:
+                raise requests.HTTPError(f'{page.status_code} Error for url: {url}')
+
             # 检查是否是直接的图片链接
-            content_type = response.headers.get('content-type', '').lower()
-            if 'image' in content_type:
-                # 这是一个直接的图片链接
-                return [{
-                    'url': url,
-                    'alt': '直接图片链接',
-                    'width': '',
-                    'height': '',
-                    'original_src': url,
-                    'is_direct_image': True
-                }]
-            
-            # 确保内容被正确解码
-            content = response.content
-            if response.encoding:
-                try:
-                    content = content.decode(response.encoding)
-                except:
-                    content = content.decode('utf-8', errors='ignore')
-            else:
-                content = content.decode('utf-8', errors='ignore')
-            
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # 提取文字内容
-            text_content = self.extract_text_content(soup, url)
+            if 'image' in page.content_type:
+                # 这是一个直接的图片链接，与页面结果同样的结构返回
+                return {
+                    'images': [{
+                        'url': url,
+                        'alt': '直接图片链接',
+                        'width': '',
+                        'height': '',
+                        'original_src': url,
+                        'is_direct_image': True
+                    }],
+                    'text_content': {}
+                }
+
+            # lxml 解析，一次遍历收集所有图片相关结构和文字内容
+            root = parse_html(page.text())
+            scan = scan_page(root, url)
+            text_content = scan.text_content
             
-            images = []
+            # 候选图片：保持发现顺序，O(1) 判重并合并重复元数据
+            images = CandidateCollector()
             
             # 查找所有img标签
-            img_tags = soup.find_all('img')
-            for img in img_tags:
+            for img in scan.imgs:
                 # 检查多种可能的src属性
                 src = (img.get('src') or 
                        img.get('data-src') or 
@@ -242,13 +259,13 @@ class ContentExtractor:
                 
                 if src:
                     # 处理srcset属性（包含多个图片URL）
-                    if 'data-srcset' in img.attrs:
+                    if 'data-srcset' in img:
                         srcset = img.get('data-srcset', '')
                         # 解析srcset中的URL
                         srcset_urls = re.findall(r'([^\s,]+)', srcset)
                         for srcset_url in srcset_urls:
                             absolute_url = urljoin(url, srcset_url)
-                            images.append({
+                            images.add({
                                 'url': absolute_url,
                                 'alt': img.get('alt', ''),
                                 'width': img.get('width', ''),
@@ -263,7 +280,7 @@ class ContentExtractor:
                     width = img.get('width', '')
                     height = img.get('height', '')
                     
-                    images.append({
+                    images.add({
                         'url': absolute_url,
                         'alt': alt_text,
                         'width': width,
@@ -272,72 +289,43 @@ class ContentExtractor:
                     })
             
             # 查找CSS背景图片
-            style_tags = soup.find_all('style')
-            for style in style_tags:
-                if style.string:
-                    # 改进的背景图片正则表达式
-                    bg_patterns = [
-                        r'background-image:\s*url\(["\']?([^"\']+)["\']?\)',
-                        r'background:\s*url\(["\']?([^"\']+)["\']?\)',
-                        r'background:\s*[^;]*url\(["\']?([^"\']+)["\']?\)',
-                    ]
-                    for pattern in bg_patterns:
-                        bg_images = re.findall(pattern, style.string, re.IGNORECASE)
-                    for bg_img in bg_images:
-                        absolute_url = urljoin(url, bg_img)
-                        images.append({
+            for style_text in scan.style_texts:
+                for bg_img in scan_css_backgrounds(style_text):
+                    absolute_url = urljoin(url, bg_img)
+                    images.add({
+                        'url': absolute_url,
+                        'alt': 'CSS背景图片',
+                        'width': '',
+                        'height': '',
+                        'original_src': bg_img,
+                        'source': 'css'
+                    })
+            
+            # 并发抓取并解析外链 CSS 文件（含 @import）中的背景图片
+            try:
+                css_urls = [urljoin(url, href) for href in scan.stylesheet_hrefs]
+                for css_url, css_text in self.css_fetcher.fetch_all(css_urls, referer=url, cookie=cookie):
+                    for bg_url in scan_css_urls(css_text):
+                        if bg_url.startswith('data:'):
+                            # 忽略内联 data url，这里交由后续逻辑处理
+                            continue
+                        absolute_url = urljoin(css_url, bg_url)
+                        images.add({
                             'url': absolute_url,
-                            'alt': 'CSS背景图片',
+                            'alt': '外链CSS背景图片',
                             'width': '',
                             'height': '',
-                                'original_src': bg_img,
-                                'source': 'css'
-                            })
-            
-            # 抓取并解析外链 CSS 文件中的背景图片
-            try:
-                stylesheet_links = soup.find_all('link', rel=lambda x: x and 'stylesheet' in x)
-                for link in stylesheet_links:
-                    href = link.get('href')
-                    if not href:
-                        continue
-                    css_url = urljoin(url, href)
-                    try:
-                        css_headers = {'Referer': url}
-                        if cookie:
-                            css_headers['Cookie'] = cookie
-                        css_resp = self.session.get(css_url, headers=css_headers, timeout=8)
-                        if css_resp.status_code == 200 and css_resp.text:
-                            css_text = css_resp.text
-                            css_bg_urls = re.findall(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)', css_text, re.IGNORECASE)
-                            for bg_url in css_bg_urls:
-                                if bg_url.startswith('data:'):
-                                    # 忽略内联 data url，这里交由后续逻辑处理
-                                    continue
-                                absolute_url = urljoin(css_url, bg_url)
-                                if not any(absolute_url == existing['url'] for existing in images):
-                                    images.append({
-                                        'url': absolute_url,
-                                        'alt': '外链CSS背景图片',
-                                        'width': '',
-                                        'height': '',
-                                        'original_src': bg_url,
-                                        'source': 'external-css'
-                                    })
-                    except Exception:
-                        # 忽略单个 CSS 拉取失败
-                        pass
+                            'original_src': bg_url,
+                            'source': 'external-css'
+                        })
             except Exception:
                 pass
 
             # 查找内联样式中的背景图片
-            elements_with_style = soup.find_all(attrs={'style': True})
-            for element in elements_with_style:
-                style_attr = element.get('style', '')
-                bg_images = re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style_attr, re.IGNORECASE)
-                for bg_img in bg_images:
+            for style_attr in scan.inline_styles:
+                for bg_img in scan_css_backgrounds(style_attr):
                     absolute_url = urljoin(url, bg_img)
-                    images.append({
+                    images.add({
                         'url': absolute_url,
                         'alt': '内联样式背景图片',
                         'width': '',
@@ -348,144 +336,90 @@ class ContentExtractor:
             
             # 查找其他可能包含图片的元素
             # 检查picture标签
-            picture_tags = soup.find_all('picture')
-            for picture in picture_tags:
-                sources = picture.find_all('source')
-                for source in sources:
-                    srcset = source.get('srcset', '')
-                    if srcset:
-                        srcset_urls = re.findall(r'([^\s,]+)', srcset)
-                        for srcset_url in srcset_urls:
-                            absolute_url = urljoin(url, srcset_url)
-                            images.append({
-                                'url': absolute_url,
-                                'alt': 'Picture元素图片',
-                                'width': '',
-                                'height': '',
-                                'original_src': srcset_url,
-                                'source': 'picture'
-                            })
+            for srcset in scan.picture_srcsets:
+                srcset_urls = re.findall(r'([^\s,]+)', srcset)
+                for srcset_url in srcset_urls:
+                    absolute_url = urljoin(url, srcset_url)
+                    images.add({
+                        'url': absolute_url,
+                        'alt': 'Picture元素图片',
+                        'width': '',
+                        'height': '',
+                        'original_src': srcset_url,
+                        'source': 'picture'
+                    })
             
             # 提取 meta 图片（OG / Twitter 等）
             try:
-                meta_candidates = []
-                meta_candidates.extend(soup.find_all('meta', attrs={'property': 'og:image'}))
-                meta_candidates.extend(soup.find_all('meta', attrs={'property': 'og:image:url'}))
-                meta_candidates.extend(soup.find_all('meta', attrs={'name': 'twitter:image'}))
-                meta_candidates.extend(soup.find_all('meta', attrs={'itemprop': 'image'}))
-                for meta in meta_candidates:
-                    content = meta.get('content')
-                    if not content:
-                        continue
+                for content in scan.meta_images:
                     absolute_url = urljoin(url, content)
-                    if not any(absolute_url == existing['url'] for existing in images):
-                        images.append({
-                            'url': absolute_url,
-                            'alt': 'Meta图片',
-                            'width': '',
-                            'height': '',
-                            'original_src': content,
-                            'source': 'meta'
-                        })
+                    images.add({
+                        'url': absolute_url,
+                        'alt': 'Meta图片',
+                        'width': '',
+                        'height': '',
+                        'original_src': content,
+                        'source': 'meta'
+                    })
             except Exception:
                 pass
 
             # 解析 noscript 中的图片
             try:
-                noscripts = soup.find_all('noscript')
-                for ns in noscripts:
-                    ns_html = ns.string or ns.decode_contents()
-                    if not ns_html:
+                for img in scan.noscript_imgs:
+                    ns_src = img.get('src') or img.get('data-src')
+                    if not ns_src:
                         continue
-                    ns_soup = BeautifulSoup(ns_html, 'html.parser')
-                    for img in ns_soup.find_all('img'):
-                        ns_src = img.get('src') or img.get('data-src')
-                        if not ns_src:
-                            continue
-                        absolute_url = urljoin(url, ns_src)
-                        if not any(absolute_url == existing['url'] for existing in images):
-                            images.append({
-                                'url': absolute_url,
-                                'alt': img.get('alt', 'noscript图片'),
-                                'width': img.get('width', ''),
-                                'height': img.get('height', ''),
-                                'original_src': ns_src,
-                                'source': 'noscript'
-                            })
+                    absolute_url = urljoin(url, ns_src)
+                    images.add({
+                        'url': absolute_url,
+                        'alt': img.get('alt', 'noscript图片'),
+                        'width': img.get('width', ''),
+                        'height': img.get('height', ''),
+                        'original_src': ns_src,
+                        'source': 'noscript'
+                    })
             except Exception:
                 pass
 
             # 检查video标签的poster属性
-            video_tags = soup.find_all('video')
-            for video in video_tags:
-                poster = video.get('poster')
-                if poster:
-                    absolute_url = urljoin(url, poster)
-                    images.append({
-                        'url': absolute_url,
-                        'alt': '视频封面',
-                        'width': '',
-                        'height': '',
-                        'original_src': poster,
-                        'source': 'video-poster'
-                        })
+            for poster in scan.video_posters:
+                absolute_url = urljoin(url, poster)
+                images.add({
+                    'url': absolute_url,
+                    'alt': '视频封面',
+                    'width': '',
+                    'height': '',
+                    'original_src': poster,
+                    'source': 'video-poster'
+                })
             
             # 查找JavaScript中的图片URL（常见模式）
-            script_tags = soup.find_all('script')
-            for script in script_tags:
-                if script.string:
-                    # 扩展的图片URL模式
-                    img_patterns = [
-                        # 标准图片格式
-                        r'https?://[^"\s,]+\.(?:jpg|jpeg|png|gif|webp|svg|bmp|ico|tiff)',
-                        # 包含images路径的URL
-                        r'https?://[^"\s,]*images[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
-                        # 特定域名模式
-                        r'https?://[^"\s,]*\.itc\.cn[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
-                        r'https?://[^"\s,]*openai\.com[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
-                        r'https?://[^"\s,]*doubao\.com[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
-                        # 缩略图
-                        r'https?://[^"\s,]*thumbnails[^"\s,]*',
-                        r'https?://[^"\s,]*thumb[^"\s,]*\.(?:jpg|jpeg|png|gif|webp)',
-                        # CDN图片
-                        r'https?://[^"\s,]*cdn[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
-                        # 数据URL (base64图片)
-                        r'data:image/[^;]+;base64,[A-Za-z0-9+/=]+',
-                        # 相对路径图片
-                        r'["\'][^"\']*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)["\']',
-                    ]
+            for script_text in scan.scripts:
+                # 单次扫描正文，覆盖所有图片URL模式（超大脚本只扫描开头部分）
+                for img_url in scan_script(script_text):
+                    # 处理相对路径
+                    if not img_url.startswith(('http://', 'https://', 'data:')):
+                        if img_url.startswith('/'):
+                            img_url = urljoin(url, img_url)
+                        else:
+                            img_url = urljoin(url, '/' + img_url)
                     
-                    for pattern in img_patterns:
-                        found_urls = re.findall(pattern, script.string, re.IGNORECASE)
-                        for img_url in found_urls:
-                            # 清理URL（移除可能的引号或逗号）
-                            img_url = img_url.strip('"\'",')
-                            
-                            # 处理相对路径
-                            if not img_url.startswith(('http://', 'https://', 'data:')):
-                                if img_url.startswith('/'):
-                                    img_url = urljoin(url, img_url)
-                                else:
-                                    img_url = urljoin(url, '/' + img_url)
-                            
-                            # 检查是否已存在
-                            if img_url and not any(img_url in existing['url'] for existing in images):
-                                images.append({
-                                    'url': img_url,
-                                    'alt': 'JavaScript动态图片',
-                                    'width': '',
-                                    'height': '',
-                                    'original_src': img_url,
-                                    'source': 'javascript'
-                                })
+                    # 检查是否已存在（宽松判重）
+                    images.add({
+                        'url': img_url,
+                        'alt': 'JavaScript动态图片',
+                        'width': '',
+                        'height': '',
+                        'original_src': img_url,
+                        'source': 'javascript'
+                    }, loose=True)
             
             # 查找JSON数据中的图片URL
-            json_scripts = soup.find_all('script', type='application/json')
-            for script in json_scripts:
-                if script.string:
+            for script_text in scan.json_scripts:
+                if script_text:
                     try:
-                        import json
-                        data = json.loads(script.string)
+                        data = json.loads(script_text)
                         # 递归查找JSON中的图片URL
                         def find_images_in_json(obj, path=""):
                             if isinstance(obj, dict):
@@ -496,15 +430,14 @@ class ContentExtractor:
                                         else:
                                             absolute_url = urljoin(url, value)
                                         
-                                        if not any(absolute_url in existing['url'] for existing in images):
-                                            images.append({
-                                                'url': absolute_url,
-                                                'alt': f'JSON数据图片 ({path}.{key})',
-                                                'width': '',
-                                                'height': '',
-                                                'original_src': value,
-                                                'source': 'json'
-                                            })
+                                        images.add({
+                                            'url': absolute_url,
+                                            'alt': f'JSON数据图片 ({path}.{key})',
+                                            'width': '',
+                                            'height': '',
+                                            'original_src': value,
+                                            'source': 'json'
+                                        }, loose=True)
                                     elif isinstance(value, (dict, list)):
                                         find_images_in_json(value, f"{path}.{key}" if path else key)
                             elif isinstance(obj, list):
@@ -515,100 +448,284 @@ class ContentExtractor:
                     except:
                         pass
             
-            # 去重处理
-            unique_images = []
-            seen_urls = set()
-            for img in images:
-                if img['url'] not in seen_urls:
-                    seen_urls.add(img['url'])
-                    unique_images.append(img)
-            
-            return {
-                'images': unique_images,
+            result = {
+                'images': images.to_list(),
                 'text_content': text_content
             }
+            if debug:
+                result['debug'] = self.build_debug_info(page, root, scan)
+            return result
             
         except requests.RequestException as e:
             return {'error': f'请求失败: {str(e)}'}
         except Exception as e:
             return {'error': f'解析失败: {str(e)}'}
     
-    def validate_image_url(self, url, referer: str = None, cookie: str = None):
-        """验证图片URL是否有效。
-        优先使用 HEAD；若被拦截或无有效 Content-Type，则回退到 GET 的前几 KB。
-        可传入 referer 以增加通过率（例如字节系 CDN 需要）。
+    def probe_image(self, url, referer: str = None, cookie: str = None):
+        """单次请求完成验证与信息获取。
+        根据 content-type 或魔数判断是否为图片，并从同一响应流中解析尺寸；
+        非图片或请求失败时返回 {'valid': False}。
+        结果写入元数据缓存；过期条目带 ETag/Last-Modified 时发起条件请求重新验证。
         """
+        key = self.meta_cache.make_key(url, referer, cookie)
+        entry, fresh = self.meta_cache.get(key)
+        if fresh:
+            return dict(entry['info'])
+
         headers = {}
         if referer:
             headers['Referer'] = referer
         if cookie:
             headers['Cookie'] = cookie
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
         try:
-            # 优先 HEAD
-            response = self.session.head(url, headers=headers, timeout=8, allow_redirects=True)
-            content_type = (response.headers.get('content-type') or '').lower()
-            if 'image' in content_type:
-                return True
-            # 某些站点不返回类型或拦截 HEAD，回退到 GET 少量数据
-            response = self.session.get(url, headers=headers, timeout=8, stream=True)
-            content_type = (response.headers.get('content-type') or '').lower()
-            if 'image' in content_type:
-                return True
-            # 简单魔数判断（只读取前 512 字节）
-            try:
-                chunk = next(response.iter_content(chunk_size=512))
-                is_image_signature = (
-                    chunk.startswith(b'\xff\xd8\xff') or  # JPEG
-                    chunk.startswith(b'\x89PNG\r\n\x1a\n') or  # PNG
-                    chunk.startswith(b'GIF87a') or chunk.startswith(b'GIF89a') or  # GIF
-                    chunk.startswith(b'BM') or  # BMP
-                    chunk.startswith(b'RIFF') or  # WEBP/AVI 容器（后续由 PIL 进一步判定）
-                    chunk.startswith(b'\x00\x00\x01\x00')  # ICO
-                )
-                return bool(is_image_signature)
-            except Exception:
-                return False
+            info, meta = self._probe_image_info(url, headers)
         except Exception:
-            return False
-    
-    def get_image_info(self, url, referer: str = None, cookie: str = None):
-        """获取图片信息，支持传入 referer"""
-        try:
-            headers = {}
-            if referer:
-                headers['Referer'] = referer
-            if cookie:
-                headers['Cookie'] = cookie
-            response = self.session.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '')
-                content_length = response.headers.get('content-length', '0')
-                
-                # 尝试获取图片尺寸
-                try:
-                    img = Image.open(io.BytesIO(response.content))
-                    width, height = img.size
-                    return {
-                        'valid': True,
-                        'content_type': content_type,
-                        'size': int(content_length),
-                        'width': width,
-                        'height': height,
-                        'format': img.format
-                    }
-                except:
-                    return {
-                        'valid': True,
-                        'content_type': content_type,
-                        'size': int(content_length),
-                        'width': 'unknown',
-                        'height': 'unknown',
-                        'format': 'unknown'
-                    }
-        except:
             return {'valid': False}
+        if meta.get('not_modified') and entry is not None:
+            self.meta_cache.refresh(key, entry)
+            return dict(entry['info'])
+        if not meta.get('is_image'):
+            info = {'valid': False}
+            # 只缓存确定的否定结果：请求成功但内容不是图片，或资源不存在
+            status = meta.get('status')
+            if status not in (200, 206) and status not in self.NEGATIVE_CACHE_STATUSES:
+                return info
+        self.meta_cache.put(key, info, etag=meta.get('etag'), last_modified=meta.get('last_modified'))
+        return info
+
+    def _probe_image_info(self, url, headers):
+        """流式读取图片头部解析尺寸，不下载完整图片。
+        服务器支持 Range 时按窗口分段请求；否则读够头部后直接断开连接。
+        返回 (info, meta)，meta 包含 status / is_image / etag / last_modified / not_modified。
+        """
+        reader = ImageHeaderReader(max_bytes=self.probe_max_bytes)
+        range_headers = dict(headers)
+        range_headers['Range'] = f'bytes=0-{self.probe_window - 1}'
+        response = self.session.get(url, headers=range_headers, timeout=10, stream=True)
+        if response.status_code == 416:
+            # 空文件等情况下 Range 不可满足，退回不带 Range 的普通请求，同样只读取头部
+            response.close()
+            response = self.session.get(url, headers=headers, timeout=10, stream=True)
+        with response:
+            if response.status_code == 304:
+                return {'valid': False}, {'not_modified': True, 'status': 304}
+            if response.status_code not in (200, 206):
+                return {'valid': False}, {'status': response.status_code}
+            content_type = response.headers.get('content-type', '')
+            ranged = response.status_code == 206
+            size = total_size_from_headers(response.headers, ranged)
+            meta = {
+                'status': response.status_code,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+            }
+            for chunk in response.iter_content(chunk_size=8192):
+                if reader.feed(chunk):
+                    break
 
-extractor = ContentExtractor()
+        # 第一个窗口不够（如 JPEG 带大块 EXIF），继续请求后续窗口；无法按头部解析的格式不再继续
+        more = ranged and needs_more_ranges(reader.buffer, content_type)
+        while more and not reader.done and (not size or len(reader.buffer) < size):
+            start = len(reader.buffer)
+            range_headers['Range'] = f'bytes={start}-{start + self.probe_window - 1}'
+            with self.session.get(url, headers=range_headers, timeout=10, stream=True) as response:
+                if response.status_code != 206:
+                    break
+                received = 0
+                for chunk in response.iter_content(chunk_size=8192):
+                    received += len(chunk)
+                    if reader.feed(chunk):
+                        break
+                if not received:
+                    break
+
+        header = reader.close() or {}
+        meta['is_image'] = 'image' in content_type.lower() or looks_like_image(bytes(reader.buffer[:16]))
+        return {
+            'valid': True,
+            'content_type': content_type,
+            'size': size,
+            'width': header.get('width', 'unknown'),
+            'height': header.get('height', 'unknown'),
+            'format': header.get('format', 'unknown')
+        }, meta
+
+    def iter_validated_images(self, images, referer: str = None, cookie: str = None, deadline: float = None):
+        """并发验证并获取图片信息，按完成顺序产出 (原始序号, 图片)，只产出有效图片。
+        超过整体截止时间仍未完成的图片会被丢弃。
+        """
+        def check(image_url):
+            info = self.probe_image(image_url, referer=referer, cookie=cookie)
+            return info if info.get('valid') else None
+
+        urls = [img['url'] for img in images]
+        for index, info in self.validation_pool.iter_results(check, urls, deadline=deadline):
+            if info is not None:
+                img = images[index]
+                img.update(info)
+                yield index, img
+
+    def validate_images(self, images, referer: str = None, cookie: str = None, deadline: float = None):
+        """并发验证并获取图片信息，按原始发现顺序返回有效图片"""
+        validated = dict(self.iter_validated_images(images, referer=referer, cookie=cookie, deadline=deadline))
+        return [validated[index] for index in sorted(validated)]
+
+    def iter_batch(self, items, deadline: float = None, batch_deadline: float = None):
+        """批量提取多个页面，按完成顺序产出 (序号, 结果)。
+        items 为 [{'url': ..., 'cookie': ...}]。页面抓取走 page_pool（按主机限流），
+        每个页面解析完立即验证自己的图片，验证完即产出，不等待其他页面。
+        deadline 为每个页面的图片验证预算，从该页面解析完成时起算；batch_deadline 限制整批的总时长。
+        同一图片跨页只探测一次（按元数据缓存键区分，Referer 类别或 Cookie 不同的页面各自探测）：
+        先引用它的页面负责探测，其他页面等待同一结果。
+        """
+        deadline = self.validation_pool.deadline if deadline is None else float(deadline)
+        batch_deadline = self.batch_deadline if batch_deadline is None else float(batch_deadline)
+        batch_expires_at = time.time() + batch_deadline
+        probes = {}          # 元数据缓存键 -> Future，结果为探测信息；截止前未完成时为 None
+        probes_lock = threading.Lock()
+
+        def check(args):
+            image_url, referer, cookie = args
+            return self.probe_image(image_url, referer=referer, cookie=cookie)
+
+        def process(index):
+            item = items[index]
+            result = self.extract_images_from_url(item['url'], cookie=item.get('cookie'))
+            if 'error' in result:
+                return {'url': item['url'], 'error': result['error']}
+
+            expires_at = min(time.time() + deadline, batch_expires_at)
+            # 认领本页首次出现的图片，由本页负责探测；其余等待其他页面的探测结果
+            owned = []           # (图片 URL, 缓存键)
+            futures = []
+            with probes_lock:
+                for img in result['images']:
+                    key = self.meta_cache.make_key(img['url'], item['url'], item.get('cookie'))
+                    future = probes.get(key)
+                    if future is None:
+                        future = probes[key] = Future()
+                        owned.append((img['url'], key))
+                    futures.append(future)
+            try:
+                remaining = max(0.0, expires_at - time.time())
+                for position, info in self.validation_pool.iter_results(
+                        check, [u for u, _ in owned], deadline=remaining,
+                        payloads=[(u, item['url'], item.get('cookie')) for u, _ in owned]):
+                    probes[owned[position][1]].set_result(info)
+            finally:
+                # 超时或异常未完成的探测也要结束，避免其他页面一直等待
+                for _, key in owned:
+                    if not probes[key].done():
+                        probes[key].set_result(None)
+
+            wait(futures, timeout=max(0.0, expires_at - time.time()))
+            validated = {}
+            partial = False
+            for position, (img, future) in enumerate(zip(result['images'], futures)):
+                info = future.result() if future.done() else None
+                if info is None:
+                    partial = True
+                elif info.get('valid'):
+                    img.update(info)
+                    validated[position] = img
+            result['validated'] = validated
+            return self._batch_page_result(item, result, partial=partial)
+
+        finished = set()
+        page_urls = [item['url'] for item in items]
+        for index, page in self.page_pool.iter_results(process, page_urls, deadline=batch_deadline + self.BATCH_GRACE,
+                                                       payloads=range(len(items))):
+            finished.add(index)
+            yield index, page
+
+        for index in range(len(items)):
+            if index not in finished:
+                yield index, {'url': items[index]['url'], 'error': '页面处理超时'}
+
+    def _batch_page_result(self, item, result, partial=False):
+        validated = result.pop('validated', {})
+        images = [validated[position] for position in sorted(validated)]
+        page = {
+            'success': True,
+            'url': item['url'],
+            'total_found': len(result['images']),
+            'valid_images': len(images),
+            'images': images,
+            'text_content': result['text_content']
+        }
+        if partial:
+            page['partial'] = True
+        return page
+
+extractor = ContentExtractor(
+    max_workers=app.config['VALIDATION_MAX_WORKERS'],
+    per_host=app.config['VALIDATION_PER_HOST'],
+    deadline=app.config['VALIDATION_DEADLINE'],
+    page_workers=app.config['BATCH_PAGE_WORKERS'],
+    batch_deadline=app.config['BATCH_DEADLINE'],
+    http_pool=HTTPPool(
+        pool_hosts=app.config['HTTP_POOL_HOSTS'],
+        pool_maxsize=app.config['HTTP_POOL_MAXSIZE'],
+        per_host=app.config['HTTP_POOL_PER_HOST'],
+        retries=app.config['HTTP_POOL_RETRIES'],
+        backoff=app.config['HTTP_POOL_BACKOFF'],
+        keepalive_idle=app.config['HTTP_POOL_KEEPALIVE'],
+        acquire_timeout=app.config['HTTP_POOL_ACQUIRE_TIMEOUT'],
+    ),
+    fetch_options={
+        'deadline': app.config['FETCH_DEADLINE'],
+        'connect_timeout': app.config['FETCH_CONNECT_TIMEOUT'],
+        'read_timeout': app.config['FETCH_READ_TIMEOUT'],
+        'backoff_base': app.config['FETCH_BACKOFF_BASE'],
+        'backoff_max': app.config['FETCH_BACKOFF_MAX'],
+        'breaker': CircuitBreaker(
+            failure_threshold=app.config['FETCH_BREAKER_THRESHOLD'],
+            reset_timeout=app.config['FETCH_BREAKER_RESET'],
+        ),
+    },
+    page_cache=PageCache(
+        max_entries=app.config['PAGE_CACHE_SIZE'],
+        ttl=app.config['PAGE_CACHE_TTL'],
+        stale_ttl=app.config['PAGE_CACHE_STALE_TTL'],
+    ),
+    meta_cache=ImageMetaCache(
+        max_entries=app.config['IMAGE_META_CACHE_SIZE'],
+        ttl=app.config['IMAGE_META_CACHE_TTL'],
+        db_path=app.config['IMAGE_META_CACHE_DB'] or None,
+    ),
+)
+proxy_cache = ProxyCache(
+    app.config['PROXY_CACHE_DIR'],
+    max_bytes=app.config['PROXY_CACHE_MAX_BYTES'],
+    ttl=app.config['PROXY_CACHE_TTL'],
+)
+browser_pool = BrowserPool(
+    browsers=app.config['BROWSER_POOL_SIZE'],
+    recycle_after=app.config['BROWSER_RECYCLE_AFTER'],
+    max_age=app.config['BROWSER_MAX_AGE'],
+    max_rss_mb=app.config['BROWSER_MAX_RSS_MB'],
+)
+capture_store = CaptureStore(
+    os.path.join(app.static_folder, 'captured'),
+    url_prefix=app.static_url_path + '/captured',
+    max_bytes=app.config['CAPTURE_MAX_BYTES'],
+    queue_size=app.config['CAPTURE_QUEUE_SIZE'],
+)
+request_policy = RequestPolicy(
+    block_types=app.config['RENDER_BLOCK_TYPES'],
+    block_domains=app.config['RENDER_BLOCK_DOMAINS'],
+    allow_domains=app.config['RENDER_ALLOW_DOMAINS'],
+    block_third_party_scripts=app.config['RENDER_BLOCK_THIRD_PARTY_SCRIPTS'],
+)
+thumb_cache = ThumbnailCache(
+    app.config['THUMB_CACHE_DIR'],
+    max_bytes=app.config['THUMB_CACHE_MAX_BYTES'],
+)
 
 @app.route('/')
 def index():
@@ -619,6 +736,11 @@ def test_images():
     with open('test_images.html', 'r', encoding='utf-8') as f:
         return f.read()
 
+@app.route('/extractor')
+def extractor_page():
+    # 图片提取页面：普通模式使用 /extract 的 NDJSON 流式接口，边验证边显示
+    return render_template('index.html')
+
 @app.route('/manual')
 def manual():
     return render_template('manual.html')
@@ -628,6 +750,71 @@ def collect_host():
     # 一个本地小页面，用于跨站点 postMessage 回传链接
     return render_template('collect_host.html')
 
+def get_stream_format(data):
+    """判断客户端是否请求流式响应：返回 'ndjson' / 'sse' / None
+    可通过请求体 stream 字段（true / 'ndjson' / 'sse'）或 Accept 头开启。
+    """
+    stream = data.get('stream') or request.args.get('stream')
+    if stream in ('sse', 'event-stream'):
+        return 'sse'
+    if stream:
+        return 'ndjson'
+    accept = request.headers.get('Accept', '')
+    if 'text/event-stream' in accept:
+        return 'sse'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return None
+
+
+def format_stream_record(record, stream_format):
+    """序列化一条流式记录：NDJSON 为一行 JSON；SSE 以记录类型作为事件名"""
+    payload = json.dumps(record, ensure_ascii=False)
+    if stream_format == 'sse':
+        return f"event: {record['type']}\ndata: {payload}\n\n"
+    return payload + '\n'
+
+
+def stream_extraction(url, result, cookie, debug, stream_format):
+    """流式返回提取结果：先输出文字内容，再按验证完成顺序逐张输出图片，最后输出汇总；
+    中途出错时输出一条 error 记录并结束"""
+    images = result['images']
+
+    def generate():
+        yield format_stream_record({
+            'type': 'text_content',
+            'url': url,
+            'total_found': len(images),
+            'text_content': result['text_content']
+        }, stream_format)
+        valid_count = 0
+        try:
+            for index, img in extractor.iter_validated_images(images, referer=url, cookie=cookie):
+                valid_count += 1
+                yield format_stream_record({'type': 'image', 'index': index, 'image': img}, stream_format)
+        except Exception as e:
+            # 响应头已发出，无法再改状态码：以 error 记录结束流
+            yield format_stream_record({'type': 'error', 'error': f'图片验证失败: {str(e)}'}, stream_format)
+            return
+        summary = {
+            'type': 'summary',
+            'success': True,
+            'url': url,
+            'total_found': len(images),
+            'valid_images': valid_count
+        }
+        if debug:
+            summary['debug'] = result.get('debug')
+        yield format_stream_record(summary, stream_format)
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    resp = Response(stream_with_context(generate()), mimetype=mimetype)
+    # 禁止代理缓冲，保证记录及时送达客户端
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
 @app.route('/extract', methods=['POST'])
 def extract_images():
     data = request.get_json()
@@ -643,18 +830,18 @@ def extract_images():
         url = 'https://' + url
     
     # 提取内容和图片
-    result = extractor.extract_images_from_url(url, cookie=cookie)
+    result = extractor.extract_images_from_url(url, cookie=cookie, debug=debug)
     
     if 'error' in result:
         return jsonify(result)
     
-    # 验证图片并获取信息
-    validated_images = []
-    for img in result['images']:
-        if extractor.validate_image_url(img['url'], referer=url, cookie=cookie):
-            info = extractor.get_image_info(img['url'], referer=url, cookie=cookie)
-            img.update(info)
-            validated_images.append(img)
+    # 流式模式：边验证边输出
+    stream_format = get_stream_format(data)
+    if stream_format:
+        return stream_extraction(url, result, cookie, debug, stream_format)
+    
+    # 并发验证图片并获取信息（保持原始发现顺序）
+    validated_images = extractor.validate_images(result['images'], referer=url, cookie=cookie)
     
     response_data = {
         'success': True,
@@ -667,98 +854,245 @@ def extract_images():
     
     # 如果启用调试模式，添加调试信息
     if debug:
-        try:
-            response = extractor.session.get(url, timeout=10)
-            # 使用相同的内容处理逻辑
-            content = response.content
-            if response.encoding:
-                try:
-                    content = content.decode(response.encoding)
-                except:
-                    content = content.decode('utf-8', errors='ignore')
-            else:
-                content = content.decode('utf-8', errors='ignore')
-            
-            soup = BeautifulSoup(content, 'html.parser')
-            response_data['debug'] = {
-                'status_code': response.status_code,
-                'content_length': len(response.content),
-                'encoding': response.encoding,
-                'title': soup.title.string if soup.title else 'No title',
-                'img_tags_count': len(soup.find_all('img')),
-                'has_scripts': len(soup.find_all('script')) > 0,
-                'sample_html': str(soup)[:1000] + '...' if len(str(soup)) > 1000 else str(soup)
-            }
-        except Exception as e:
-            response_data['debug'] = {'error': str(e)}
+        response_data['debug'] = result.get('debug')
     
     return jsonify(response_data)
 
+@app.route('/extract/batch', methods=['POST'])
+def extract_images_batch():
+    """批量提取：{"urls": [...], "cookie": ...} 或 {"items": [{"url": ..., "cookie": ...}]}"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    default_cookie = data.get('cookie')
+    raw_items = data.get('items') or data.get('urls') or []
+    if not isinstance(raw_items, list):
+        return jsonify({'error': 'items / urls 必须是数组'}), 400
+
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            raw = {'url': raw}
+        if not isinstance(raw, dict) or not isinstance(raw.get('url') or '', str) \
+                or not isinstance(raw.get('cookie') or '', str):
+            return jsonify({'error': '每一项必须是 URL 字符串或 {"url": ..., "cookie": ...} 对象'}), 400
+        url = (raw.get('url') or '').strip()
+        if not url:
+            continue
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        items.append({'url': url, 'cookie': raw.get('cookie') or default_cookie})
+
+    if not items:
+        return jsonify({'error': '请输入URL'})
+    if len(items) > app.config['BATCH_MAX_URLS']:
+        return jsonify({'error': f"一次最多提交 {app.config['BATCH_MAX_URLS']} 个URL"}), 400
+
+    stream_format = get_stream_format(data)
+    if stream_format:
+        def generate():
+            succeeded = 0
+            try:
+                for index, result in extractor.iter_batch(items):
+                    succeeded += 1 if result.get('success') else 0
+                    yield format_stream_record({'type': 'page', 'index': index, 'result': result}, stream_format)
+            except Exception as e:
+                yield format_stream_record({'type': 'error', 'error': f'批量提取失败: {str(e)}'}, stream_format)
+            yield format_stream_record({
+                'type': 'summary',
+                'success': True,
+                'count': len(items),
+                'succeeded': succeeded,
+                'failed': len(items) - succeeded
+            }, stream_format)
+
+        mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+        resp = Response(stream_with_context(generate()), mimetype=mimetype)
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+
+    results = [None] * len(items)
+    for index, result in extractor.iter_batch(items):
+        results[index] = result
+    return jsonify({
+        'success': True,
+        'count': len(items),
+        'results': results
+    })
+
+
+def _with_cors(resp):
+    """为代理响应添加 CORS 头，允许跨域访问"""
+    resp.headers['Access-Control-Allow-Origin'] = '*'
+    resp.headers['Access-Control-Allow-Methods'] = 'GET'
+    resp.headers['Access-Control-Allow-Headers'] = 'Content-Type, Range'
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 3600
+    return resp
+
+
+def _client_has_fresh_copy(etag, last_modified=None):
+    """客户端缓存是否仍然有效：有 If-None-Match 时按 ETag 弱比较，否则看 If-Modified-Since"""
+    if request.if_none_match:
+        if not etag:
+            return False
+        value, _ = unquote_etag(etag)
+        return value is not None and request.if_none_match.contains_weak(value)
+    if request.if_modified_since and last_modified:
+        modified = parse_date(last_modified)
+        return modified is not None and modified <= request.if_modified_since
+    return False
+
+
+def _not_modified(etag, last_modified=None, cache_status=None):
+    resp = Response(status=304)
+    if etag:
+        resp.headers['ETag'] = etag
+    if last_modified:
+        resp.headers['Last-Modified'] = last_modified
+    if cache_status:
+        resp.headers['X-Proxy-Cache'] = cache_status
+    return _with_cors(resp)
+
+
+def _lookup_image(image_url, base_headers=PROXY_HEADERS):
+    """查找缓存的图片正文，返回 (entry, cache_status, upstream)
+
+    命中或经条件请求续期时 upstream 为 None；未命中时 entry 为 None，
+    upstream 为尚未读取正文的上游响应。base_headers 为请求上游的基础请求头。
+    """
+    entry, fresh = proxy_cache.get(image_url)
+    if entry is not None and fresh:
+        return entry, 'HIT', None
+
+    conditional = {}
+    if entry is not None:
+        if entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+
+    upstream = open_upstream(extractor.session, image_url, headers=conditional,
+                             max_bytes=app.config['PROXY_MAX_BYTES'], base_headers=base_headers)
+    if upstream.status_code == 304 and entry is not None:
+        upstream.close()
+        entry = proxy_cache.refresh(image_url, upstream.headers) or entry
+        return entry, 'REVALIDATED', None
+    return None, 'MISS', upstream
+
+
+def _fill_image_cache(image_url, upstream):
+    """把上游正文完整写入缓存，返回 (条目, None)
+
+    正文不是图片时不写缓存，返回 (None, 尚未转发的正文生成器)，由调用方原样转发；
+    正文不完整或缓存不可用时返回 (None, None)。
+    """
+    max_bytes = app.config['PROXY_MAX_BYTES']
+    try:
+        first, body = peek_body(iter_body(upstream, max_bytes=max_bytes))
+        if not is_image_content(upstream.headers.get('Content-Type'), first):
+            return None, body
+        for _ in proxy_cache.tee(image_url, upstream, body, max_bytes=max_bytes):
+            pass
+    except ProxyTooLarge:
+        return None, None
+    entry, _ = proxy_cache.get(image_url)
+    return entry, None
+
+
+def _set_attachment(resp, filename):
+    try:
+        filename.encode('ascii')
+        resp.headers.set('Content-Disposition', 'attachment', filename=filename)
+    except UnicodeEncodeError:
+        resp.headers.set('Content-Disposition', 'attachment',
+                         filename=quote(filename), **{'filename*': "UTF-8''" + quote(filename)})
+
+
+def _serve_cached_image(entry, cache_status, download_name=None):
+    """从磁盘缓存返回图片：支持 304、单区间与多区间 Range"""
+    etag = proxy_cache.client_etag(entry)
+    last_modified = entry.get('last_modified')
+    if _client_has_fresh_copy(etag, last_modified):
+        return _not_modified(etag, last_modified, cache_status)
+
+    path = proxy_cache.path_of(entry)
+    ranges = None
+    if if_range_matches(request.headers.get('If-Range'), etag, last_modified):
+        try:
+            ranges = parse_ranges(request.headers.get('Range'), entry['size'])
+        except RangeNotSatisfiable:
+            return _with_cors(not_satisfiable_response(entry['size']))
+
+    if ranges:
+        resp = range_response(path, ranges, entry['content_type'], size=entry['size'])
+    else:
+        resp = send_file(path, mimetype=entry['content_type'], etag=False,
+                         conditional=False, last_modified=None, max_age=None)
+    if download_name:
+        _set_attachment(resp, download_name)
+    resp.headers['Accept-Ranges'] = 'bytes'
+    resp.headers['ETag'] = etag
+    if last_modified:
+        resp.headers['Last-Modified'] = last_modified
+    resp.headers['X-Proxy-Cache'] = cache_status
+    return _with_cors(resp)
+
+
+@app.route('/stats/http_pool')
+def http_pool_stats():
+    """上游连接池使用情况，用于在真实并发下调整连接池大小"""
+    stats = extractor.http_pool.stats()
+    stats['circuit_breakers'] = extractor.page_fetcher.breaker.stats()
+    stats['browser_pool'] = browser_pool.stats()
+    stats['capture_store'] = capture_store.stats()
+    return jsonify(stats)
+
+
 @app.route('/proxy_image')
 def proxy_image():
-    """代理图片，用于绕过 CORS 和 Referer 限制"""
+    """代理图片，用于绕过 CORS 和 Referer 限制
+
+    命中磁盘缓存时直接返回；过期条目先向上游发条件请求，304 则续期复用。
+    未命中时上游正文边收边转发，同时写入缓存，不在内存中整体缓冲；
+    带 Range 的请求则先写满缓存，再按区间返回。
+    """
     try:
-        # 从查询参数获取 URL
+        # 从查询参数获取 URL（base64 或 URL 编码）
         image_url = request.args.get('url', '')
         if not image_url:
             return jsonify({'error': '缺少 url 参数'}), 400
-        
-        # 如果是 base64 编码，先解码
+        image_url = decode_proxy_url(image_url)
+
         try:
-            import base64
-            from urllib.parse import unquote
-            # 先 base64 解码，然后 URL 解码
-            decoded_bytes = base64.b64decode(image_url)
-            image_url = unquote(decoded_bytes.decode('utf-8'))
-        except:
-            # 如果不是 base64，尝试 URL 解码
-            try:
-                from urllib.parse import unquote
-                image_url = unquote(image_url)
-            except:
-                pass  # 如果都失败，直接使用原 URL
-        
-        if not image_url.startswith(('http://', 'https://')):
-            image_url = 'https://' + image_url
-        
-        # 强制使用 HTTPS，解决 Mixed Content 问题
-        if image_url.startswith('http://'):
-            image_url = image_url.replace('http://', 'https://', 1)
-        
-        # 添加 Referer 和 User-Agent 头，模拟浏览器请求
-        # 对于小红书图片，需要更完整的浏览器头
-        headers = {
-            'Referer': 'https://www.xiaohongshu.com/',
-            'Origin': 'https://www.xiaohongshu.com',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
-            'Sec-Fetch-Dest': 'image',
-            'Sec-Fetch-Mode': 'no-cors',
-            'Sec-Fetch-Site': 'cross-site',
-        }
-        
-        response = extractor.session.get(image_url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status()
-        
-        # 获取内容类型
-        content_type = response.headers.get('content-type', 'image/jpeg')
-        
-        # 使用 send_file 返回图片，并设置 CORS 头
-        from flask import make_response
-        resp = make_response(send_file(
-            io.BytesIO(response.content),
-            mimetype=content_type,
-            max_age=3600
-        ))
-        # 添加 CORS 头，允许跨域访问
-        resp.headers['Access-Control-Allow-Origin'] = '*'
-        resp.headers['Access-Control-Allow-Methods'] = 'GET'
-        resp.headers['Access-Control-Allow-Headers'] = 'Content-Type'
-        return resp
+            entry, cache_status, upstream = _lookup_image(image_url)
+        except ProxyTooLarge as e:
+            return jsonify({'error': str(e), 'url': image_url}), 413
+
+        if upstream is not None and proxy_cache.enabled and request.headers.get('Range'):
+            entry, body = _fill_image_cache(image_url, upstream)
+            if body is not None:
+                # 不是图片（错误页等）：不缓存，忽略 Range 原样转发
+                resp = Response(stream_with_context(body), status=upstream.status_code,
+                                headers=passthrough_headers(upstream))
+                resp.headers['X-Proxy-Cache'] = cache_status
+                return _with_cors(resp)
+            if entry is None:
+                return jsonify({'error': '图片过大或传输不完整', 'url': image_url}), 413
+        if entry is not None:
+            return _serve_cached_image(entry, cache_status)
+
+        headers = passthrough_headers(upstream)
+        if _client_has_fresh_copy(headers.get('ETag'), headers.get('Last-Modified')):
+            upstream.close()
+            return _not_modified(headers.get('ETag'), headers.get('Last-Modified'), cache_status)
+
+        max_bytes = app.config['PROXY_MAX_BYTES']
+        body = proxy_cache.tee(image_url, upstream, iter_body(upstream, max_bytes=max_bytes), max_bytes=max_bytes)
+        resp = Response(stream_with_context(body), headers=headers)
+        resp.headers['X-Proxy-Cache'] = cache_status
+        return _with_cors(resp)
     except Exception as e:
         # 记录错误以便调试
         import traceback
@@ -766,25 +1100,103 @@ def proxy_image():
         print(f"代理图片错误: {error_msg}")
         return jsonify({'error': f'图片代理失败: {str(e)}', 'url': image_url if 'image_url' in locals() else 'unknown'}), 400
 
+@app.route('/thumb')
+def thumbnail():
+    """缩略图：/thumb?url=...&w=&h=&q=&fmt=webp|jpeg|auto
+
+    url 的编码方式与 /proxy_image 相同，源图经由代理缓存获取；
+    生成的变体写入磁盘缓存，Pillow 无法解码的图片（如 SVG）退回原图代理。
+    """
+    try:
+        raw_url = request.args.get('url', '')
+        if not raw_url:
+            return jsonify({'error': '缺少 url 参数'}), 400
+        try:
+            params = normalize_params(request.args.get('w'), request.args.get('h'), request.args.get('q'),
+                                      request.args.get('fmt'), request.headers.get('Accept', ''))
+        except ValueError:
+            return jsonify({'error': 'w / h 必须是正整数，q 必须是整数'}), 400
+        if params is None:
+            return jsonify({'error': '缺少 w 或 h 参数'}), 400
+        image_url = decode_proxy_url(raw_url)
+
+        try:
+            entry, cache_status, upstream = _lookup_image(image_url)
+        except ProxyTooLarge as e:
+            return jsonify({'error': str(e), 'url': image_url}), 413
+        if upstream is not None and proxy_cache.enabled:
+            entry, body = _fill_image_cache(image_url, upstream)
+            if body is not None:
+                # 不是图片，无法生成缩略图：与无法解码的图片一样退回原图代理
+                body.close()
+                return redirect(url_for('proxy_image', url=raw_url))
+            if entry is None:
+                return jsonify({'error': '图片过大或传输不完整', 'url': image_url}), 413
+
+        if entry is not None:
+            source, source_id = proxy_cache.path_of(entry), entry['file']
+        else:
+            # 代理缓存不可用时在内存中处理
+            try:
+                body = b''.join(iter_body(upstream, max_bytes=app.config['PROXY_MAX_BYTES']))
+            except ProxyTooLarge as e:
+                return jsonify({'error': str(e), 'url': image_url}), 413
+            source, source_id = io.BytesIO(body), hashlib.sha256(body).hexdigest()[:16]
+
+        fmt = params['format']
+        key = thumb_cache.key_of(source_id, params)
+        path = thumb_cache.get(key, fmt)
+        data = None
+        if path is None:
+            try:
+                data = render_thumbnail(source, params['width'], params['height'], params['quality'], fmt)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                return redirect(url_for('proxy_image', url=raw_url))
+            path = thumb_cache.put(key, fmt, data)
+
+        mimetype = THUMB_FORMATS[fmt][1]
+        if path is not None and path.is_file():
+            resp = send_file(path, mimetype=mimetype, etag=key, conditional=True, max_age=None)
+        else:
+            resp = send_file(io.BytesIO(data), mimetype=mimetype, etag=key, conditional=True, max_age=None)
+        if (request.args.get('fmt') or 'auto').lower() == 'auto':
+            resp.vary.add('Accept')
+        resp.headers['X-Proxy-Cache'] = cache_status
+        return _with_cors(resp)
+    except Exception as e:
+        print(f"缩略图错误: {e}")
+        return jsonify({'error': f'缩略图生成失败: {str(e)}'}), 400
+
+
 @app.route('/download/<path:image_url>')
 def download_image(image_url):
-    """下载图片"""
+    """下载图片：正文经由代理缓存，支持断点续传（Range）与条件请求"""
     try:
-        response = extractor.session.get(image_url, timeout=10)
-        response.raise_for_status()
-        
         # 获取文件名
         parsed_url = urlparse(image_url)
         filename = os.path.basename(parsed_url.path)
         if not filename or '.' not in filename:
             filename = 'image.jpg'
-        
-        return send_file(
-            io.BytesIO(response.content),
-            as_attachment=True,
-            download_name=filename,
-            mimetype=response.headers.get('content-type', 'image/jpeg')
-        )
+
+        try:
+            entry, cache_status, upstream = _lookup_image(image_url, base_headers=DOWNLOAD_HEADERS)
+        except ProxyTooLarge as e:
+            return jsonify({'error': f'下载失败: {str(e)}'}), 413
+
+        body = None
+        if upstream is not None and proxy_cache.enabled:
+            entry, body = _fill_image_cache(image_url, upstream)
+            if entry is None and body is None:
+                return jsonify({'error': '下载失败: 图片过大或传输不完整'}), 413
+        if entry is not None:
+            return _serve_cached_image(entry, cache_status, download_name=filename)
+
+        # 缓存不可用（只读文件系统）或正文不是图片：直接流式转发，不写缓存
+        if body is None:
+            body = iter_body(upstream, max_bytes=app.config['PROXY_MAX_BYTES'])
+        resp = Response(stream_with_context(body), headers=passthrough_headers(upstream))
+        _set_attachment(resp, filename)
+        return resp
     except Exception as e:
         return jsonify({'error': f'下载失败: {str(e)}'}), 400
 
@@ -801,14 +1213,8 @@ def collect_link():
             pixel = base64.b64decode('R0lGODlhAQABAPAAAP///wAAACH5BAAAAAAALAAAAAABAAEAAAICRAEAOw==')
             return send_file(io.BytesIO(pixel), mimetype='image/gif')
 
-        item = {
-            'url': url,
-            'referer': referer or '',
-            'ts': datetime.utcnow().isoformat() + 'Z'
-        }
-        # 去重
-        if not any(x['url'] == url for x in collected_links):
-            collected_links.append(item)
+        # 内存摘要集合 O(1) 去重，新链接由后台线程批量写入数据库
+        collect_store.add(url, referer=referer or '')
 
         # 作为像素返回，便于 bookmarklet 用 <img> 方式上报
         pixel = base64.b64decode('R0lGODlhAQABAPAAAP///wAAACH5BAAAAAAALAAAAAABAAEAAAICRAEAOw==')
@@ -817,26 +1223,131 @@ def collect_link():
         return jsonify({'error': str(e)}), 400
 
 
+class UnsupportedContentEncoding(Exception):
+    """批量上报使用了不支持的 Content-Encoding"""
+
+
+def _read_batch_body(max_bytes):
+    """读取批量上报的正文，按 Content-Encoding 解压（gzip / deflate），解压后超过 max_bytes 抛出 ValueError；
+    其他编码（如 br）抛出 UnsupportedContentEncoding"""
+    encoding = (request.headers.get('Content-Encoding') or '').strip().lower()
+    if encoding not in ('', 'identity', 'gzip', 'deflate'):
+        raise UnsupportedContentEncoding(f'不支持的 Content-Encoding: {encoding}')
+    raw = request.get_data(cache=False)
+    if encoding in ('gzip', 'deflate'):
+        wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+        decompressor = zlib.decompressobj(wbits)
+        raw = decompressor.decompress(raw, max_bytes + 1)
+        if len(raw) > max_bytes or decompressor.unconsumed_tail:
+            raise ValueError('解压后的正文过大')
+    elif len(raw) > max_bytes:
+        raise ValueError('正文过大')
+    return raw.decode('utf-8', errors='ignore')
+
+
+@app.route('/collect/batch', methods=['POST', 'OPTIONS'])
+def collect_batch():
+    """批量上报：JSON 数组 / {"urls": [...]} / 逐行 URL 或 NDJSON，可 gzip 压缩；一次事务批量写入
+
+    返回紧凑的确认：{"ok": 1, "n": 新增数, "dup": 重复数}
+    """
+    if request.method == 'OPTIONS':
+        resp = Response(status=204)
+    else:
+        referer = request.args.get('ref') or request.headers.get('Referer') or ''
+        try:
+            items = parse_batch(_read_batch_body(app.config['COLLECT_BATCH_MAX_BYTES']), referer=referer)
+        except UnsupportedContentEncoding as e:
+            return jsonify({'ok': 0, 'error': str(e)}), 415
+        except (ValueError, zlib.error) as e:
+            return jsonify({'ok': 0, 'error': str(e)}), 400
+        added, duplicates = collect_store.add_many(items)
+        resp = jsonify({'ok': 1, 'n': added, 'dup': duplicates})
+    # 书签脚本在任意站点上报，允许跨域
+    resp.headers['Access-Control-Allow-Origin'] = '*'
+    resp.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+    resp.headers['Access-Control-Allow-Headers'] = 'Content-Type, Content-Encoding'
+    return resp
+
+
+def _parse_time_param(value):
+    """时间参数：Unix 时间戳或 ISO 8601 字符串；为空返回 None，格式错误抛出 ValueError"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        value = value.strip().replace('Z', '+00:00')
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def _collected_query_args():
+    """解析 /collected 与 /collected/view 的分页与筛选参数"""
+    limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    return {
+        'cursor': int(request.args.get('cursor') or 0),
+        'limit': limit,
+        'referer': request.args.get('referer') or None,
+        'since': _parse_time_param(request.args.get('since')),
+        'until': _parse_time_param(request.args.get('until')),
+    }
+
+
 @app.route('/collected', methods=['GET'])
 def list_collected():
-    return jsonify({'count': len(collected_links), 'items': collected_links})
+    """已收集链接：按游标分页
+
+    参数：cursor（上一页的 next_cursor）、limit（默认 100，最大 1000）、
+    referer（来源页前缀）、since / until（时间戳或 ISO 时间）。
+    轮询新增条目时持续用返回的 next_cursor 作为 cursor 即可。
+    """
+    try:
+        args = _collected_query_args()
+    except ValueError:
+        return jsonify({'error': '分页或时间参数格式错误'}), 400
+    items, next_cursor, has_more = collect_store.query(**args)
+    return jsonify({
+        'count': len(items),
+        'total': collect_store.count(),
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
 
 
 @app.route('/collected/view')
 def view_collected():
-    # 简单可视化页面
+    # 简单可视化页面：分页显示，缩略图懒加载
+    try:
+        args = _collected_query_args()
+    except ValueError:
+        return jsonify({'error': '分页或时间参数格式错误'}), 400
+    if 'limit' not in request.args:
+        args['limit'] = 60
+    items, next_cursor, has_more = collect_store.query(**args)
+
     html = [
         '<!DOCTYPE html><html><head><meta charset="utf-8"><title>已收集图片链接</title>',
-        '<style>body{font-family:-apple-system,Segoe UI,Roboto,Helvetica,Arial;padding:20px} .url{word-break:break-all;color:#2563eb} .grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(320px,1fr));gap:12px} .card{border:1px solid #e5e7eb;border-radius:10px;padding:12px} img{max-width:100%;height:180px;object-fit:contain;background:#f3f4f6}</style>',
+        '<style>body{font-family:-apple-system,Segoe UI,Roboto,Helvetica,Arial;padding:20px} .url{word-break:break-all;color:#2563eb} .grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(320px,1fr));gap:12px} .card{border:1px solid #e5e7eb;border-radius:10px;padding:12px} img{max-width:100%;height:180px;object-fit:contain;background:#f3f4f6} .pager{margin:16px 0}</style>',
         '</head><body>'
     ]
-    html.append(f'<h2>已收集 {len(collected_links)} 张图片</h2>')
+    html.append(f'<h2>已收集 {collect_store.count()} 张图片</h2>')
     html.append('<p><a href="/collected" target="_blank">查看 JSON</a></p>')
     html.append('<div class="grid">')
-    for it in collected_links:
-        url = it['url']
-        html.append(f'<div class="card"><div><img src="{url}" onerror="this.style.display=\'none\'"/></div><div class="url">{url}</div></div>')
-    html.append('</div></body></html>')
+    for it in items:
+        url = escape(it['url'])
+        # 卡片高 180px，按 2 倍像素取缩略图；缩略图失败时退回原图
+        thumb = escape(url_for('thumbnail', url=encode_proxy_url(it['url']), h=360))
+        html.append(f'<div class="card"><div><img src="{thumb}" data-src="{url}" loading="lazy" decoding="async" height="180" onerror="if(this.dataset.src&&this.src!==this.dataset.src){{this.src=this.dataset.src}}else{{this.style.display=\'none\'}}"/></div><div class="url">{url}</div></div>')
+    html.append('</div>')
+    if has_more:
+        params = {k: v for k, v in request.args.items() if k != 'cursor'}
+        params['cursor'] = next_cursor
+        html.append(f'<p class="pager"><a href="{escape(url_for("view_collected", **params))}">下一页 →</a></p>')
+    html.append('</body></html>')
     return ''.join(html)
 
 
@@ -854,7 +1365,11 @@ def extract_images_rendered():
     data = request.get_json()
     url = data.get('url', '').strip()
     max_scrolls = int(data.get('maxScrolls', 30))
-    scroll_pause_ms = int(data.get('scrollPauseMs', 700))
+    # 每步（滚动、点击加载更多）等待页面稳定的上限；网络与 DOM 静默 quietMs 毫秒即视为稳定
+    scroll_pause_ms = int(data.get('scrollPauseMs', 3000))
+    quiet_ms = int(data.get('quietMs', 300))
+    # 拦截字体、音视频、统计广告等与图片无关的请求；传 false 关闭
+    block_resources = data.get('blockResources', True) is not False
     timeout_ms = int(data.get('timeoutMs', 45000))
     wait_until = data.get('waitUntil', 'networkidle')  # or 'domcontentloaded'
     debug = bool(data.get('debug', False))
@@ -869,196 +1384,89 @@ def extract_images_rendered():
     try:
         # 延迟导入，避免未安装时报错阻断其他接口
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401
         except ImportError:
             return jsonify({'error': 'Playwright is not available on this server. This feature requires playwright to be installed.'}), 503
 
-        collected_urls = set()
+        collected_urls = set()       # 网络上见到、但没能读取响应体的图片地址
         saved_local_urls = set()
+        # 截获的图片响应体交给后台线程保存，渲染结束后再取回本地地址
+        captures = capture_store.batch()
 
-        # 确保本地保存目录存在
-        static_dir = Path('static') / 'captured'
-        try:
-            static_dir.mkdir(parents=True, exist_ok=True)
-        except (OSError, PermissionError):
-            pass  # 在只读文件系统中忽略错误
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            extra_headers = {
-                'Accept-Language': extractor.session.headers.get('Accept-Language', 'zh-CN,zh;q=0.9'),
-                'Referer': url
-            }
-            if cookie:
-                extra_headers['Cookie'] = cookie
-            context = browser.new_context(
-                user_agent=extractor.session.headers.get('User-Agent'),
-                java_script_enabled=True,
-                bypass_csp=True,
-                ignore_https_errors=True,
-                extra_http_headers=extra_headers
-            )
+        extra_headers = {
+            'Accept-Language': extractor.session.headers.get('Accept-Language', 'zh-CN,zh;q=0.9'),
+            'Referer': url
+        }
+        if cookie:
+            extra_headers['Cookie'] = cookie
+        context_options = {
+            'user_agent': extractor.session.headers.get('User-Agent'),
+            'java_script_enabled': True,
+            'bypass_csp': True,
+            'ignore_https_errors': True,
+            'extra_http_headers': extra_headers
+        }
+        if block_resources:
+            # Service Worker 发出的请求不经过 page.route，拦截时禁用
+            context_options['service_workers'] = 'block'
 
+        # 在浏览器池的线程中执行：每个请求一个独立的 BrowserContext，结束后由浏览器池关闭
+        def render(context):
+            timer.record('queue', time.monotonic() - submitted_at)
             page = context.new_page()
             try:
                 page.set_default_navigation_timeout(timeout_ms)
             except Exception:
                 pass
+            # 网络与 DOM 活动监测，需在导航前注册
+            activity = PageActivity(page, quiet_ms=quiet_ms)
+            request_stats = request_policy.attach(page, url) if block_resources else None
 
-            # 监听网络响应，收集图片；必要时直接保存响应体到本地以避免二次请求失败
+            # 监听网络响应，收集图片；直接保存响应体到本地以避免二次请求失败
             def on_response(response):
                 try:
-                    ct = (response.headers.get('content-type') or '').lower()
+                    ct = response.headers.get('content-type') or ''
                     url_ = response.url
-                    # 1) content-type 指示为 image
-                    if 'image' in ct or response.request.resource_type == 'image':
-                        try:
-                            body = response.body()
-                            # 文件扩展名
-                            ext = 'jpg'
-                            if 'png' in ct:
-                                ext = 'png'
-                            elif 'gif' in ct:
-                                ext = 'gif'
-                            elif 'webp' in ct:
-                                ext = 'webp'
-                            elif 'svg' in ct:
-                                ext = 'svg'
-                            elif 'bmp' in ct:
-                                ext = 'bmp'
-                            # 内容哈希去重
-                            h = hashlib.sha256(body).hexdigest()[:16]
-                            filename = f"{h}.{ext}"
-                            file_path = static_dir / filename
-                            if not file_path.exists():
-                                file_path.write_bytes(body)
-                            local_url = f"/static/captured/{filename}"
-                            collected_urls.add(local_url)
-                            saved_local_urls.add(local_url)
-                            return
-                        except Exception:
-                            collected_urls.add(url_)
-                            return
-                    # 2) URL 后缀或域名特征判断（字节系 byteimg CDN 等）
-                    if url_:
-                        lower = url_.split('?')[0].lower()
-                        if any(lower.endswith(ext) for ext in ['.jpg','.jpeg','.png','.gif','.webp','.svg','.bmp','.ico','.tiff']):
-                            try:
-                                body = response.body()
-                                # 推断扩展
-                                ext = lower.rsplit('.', 1)[-1]
-                                if ext not in ['jpg','jpeg','png','gif','webp','svg','bmp','ico','tiff']:
-                                    ext = 'jpg'
-                                h = hashlib.sha256(body).hexdigest()[:16]
-                                filename = f"{h}.{ext}"
-                                file_path = static_dir / filename
-                                if not file_path.exists():
-                                    file_path.write_bytes(body)
-                                local_url = f"/static/captured/{filename}"
-                                collected_urls.add(local_url)
-                                saved_local_urls.add(local_url)
-                                return
-                            except Exception:
-                                collected_urls.add(url_)
-                                return
-                        if 'byteimg.com' in lower or 'doubao' in lower:
-                            try:
-                                body = response.body()
-                                h = hashlib.sha256(body).hexdigest()[:16]
-                                # 尝试从 content-type 推断扩展
-                                ext = 'jpg'
-                                if 'png' in ct:
-                                    ext = 'png'
-                                elif 'gif' in ct:
-                                    ext = 'gif'
-                                elif 'webp' in ct:
-                                    ext = 'webp'
-                                filename = f"{h}.{ext}"
-                                file_path = static_dir / filename
-                                if not file_path.exists():
-                                    file_path.write_bytes(body)
-                                local_url = f"/static/captured/{filename}"
-                                collected_urls.add(local_url)
-                                saved_local_urls.add(local_url)
-                                return
-                            except Exception:
-                                collected_urls.add(url_)
-                                return
+                    if not is_capturable(url_, ct, response.request.resource_type):
+                        return
+                    try:
+                        body = response.body()
+                    except Exception:
+                        collected_urls.add(url_)
+                        return
+                    captures.add(url_, body, ct)
                 except Exception:
                     pass
 
             page.on('response', on_response)
 
-            # 更稳健的导航：先按用户指定策略；失败则回退到 domcontentloaded，然后尽量等待一次 networkidle
-            try:
-                page.goto(url, wait_until=wait_until, timeout=timeout_ms)
-            except Exception:
+            # 更稳健的导航：先按用户指定策略；失败则回退到 domcontentloaded，然后等待页面稳定
+            with timer.phase('navigate'):
                 try:
-                    page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms)
+                    page.goto(url, wait_until=wait_until, timeout=timeout_ms)
                 except Exception:
-                    pass
-            try:
-                page.wait_for_load_state('networkidle', timeout=min(8000, timeout_ms))
-            except Exception:
-                pass
-
-            # 尝试点击“加载更多/查看更多/展开”等按钮，帮助触发更多内容加载
-            try:
-                for _ in range(5):
-                    candidates = page.locator("text=/加载更多|查看更多|更多|展开|Load more|More|Show more/i")
-                    count = candidates.count()
-                    if count == 0:
-                        break
-                    # 逐个点击可见按钮
-                    for i in range(min(count, 3)):
-                        try:
-                            candidates.nth(i).click(timeout=1500)
-                            time.sleep(0.5)
-                        except Exception:
-                            pass
                     try:
-                        page.wait_for_load_state('networkidle', timeout=3000)
+                        page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms)
                     except Exception:
                         pass
-            except Exception:
-                pass
+            with timer.phase('settle'):
+                activity.wait_quiet(min(8000, timeout_ms))
 
-            # 自动滚动，触发懒加载
-            last_height = 0
-            same_count = 0
-            for _ in range(max_scrolls):
-                page.evaluate('window.scrollBy(0, Math.max(600, window.innerHeight));')
-                time.sleep(scroll_pause_ms / 1000.0)
-                height = page.evaluate('document.body.scrollHeight')
-                if height == last_height:
-                    same_count += 1
-                    if same_count >= 2:
-                        break
-                else:
-                    same_count = 0
-                last_height = height
-                try:
-                    page.wait_for_load_state('networkidle', timeout=2500)
-                except Exception:
-                    pass
+            # 尝试点击“加载更多/查看更多/展开”等按钮，帮助触发更多内容加载
+            with timer.phase('load_more'):
+                clicks = click_load_more(page, activity, settle_ms=scroll_pause_ms)
+
+            # 自动滚动，触发懒加载：每步等到新内容加载完成即继续，不做固定等待
+            with timer.phase('scroll'):
+                scroll_stats = auto_scroll(page, activity, max_scrolls=max_scrolls, settle_ms=scroll_pause_ms)
+            scroll_stats['load_more_clicks'] = clicks
 
             # 将可能懒加载的图片元素滚动进视口，触发加载
-            try:
-                page.evaluate("""
-                    () => {
-                      const lazyAttrs = ['data-src','data-original','data-lazy-src','data-url','data-image','data-img'];
-                      const nodes = Array.from(document.querySelectorAll('img, [data-src], [data-original], [data-lazy-src]'));
-                      nodes.forEach(el => { try { el.scrollIntoView({behavior:'instant', block:'center'}); } catch(e){} });
-                    }
-                """)
-                try:
-                    page.wait_for_load_state('networkidle', timeout=3000)
-                except Exception:
-                    pass
-            except Exception:
-                pass
+            with timer.phase('reveal'):
+                reveal_lazy_images(page, activity, settle_ms=scroll_pause_ms)
 
             # DOM 扫描：img/srcset/picture/source、video.poster、计算样式背景图，以及文字内容
+            scan_started = time.monotonic()
             dom_data = page.evaluate("""
                 () => {
                   const urls = new Set();
@@ -1185,39 +1593,64 @@ def extract_images_rendered():
                   };
                 }
             """)
+            timer.record('dom_scan', time.monotonic() - scan_started)
+            scroll_stats['network_requests'] = activity.requests_seen
+            return dom_data, scroll_stats, request_stats.as_dict() if request_stats else None
+
+        timer = PhaseTimer()
+        submitted_at = time.monotonic()
+        dom_data, scroll_stats, request_stats = browser_pool.run(
+            render, context_options=context_options, timeout=app.config['BROWSER_POOL_TIMEOUT'])
+
+        # 网络截获的图片：尺寸、格式、大小直接由响应体得出，不再发起请求
+        captured_images = []
+        observed_urls = set()    # 已由响应体处理过的网络地址（包括不是图片的）
+        with timer.phase('capture_wait'):
+            for source_url, local_url, info in captures.results(timeout=app.config['CAPTURE_WAIT_TIMEOUT']):
+                if info is False:
+                    # 未来得及处理，按普通地址探测
+                    collected_urls.add(source_url)
+                    continue
+                observed_urls.add(source_url)
+                image_url = local_url or source_url
+                if not info or image_url in saved_local_urls:
+                    continue
+                saved_local_urls.add(image_url)
+                image = {'url': image_url, 'source_url': source_url}
+                image.update(info)
+                captured_images.append(image)
+
+        # 只并发探测 DOM 中出现、但网络上没有截获到正文的地址
+        probe_urls = [u for u in dict.fromkeys(list(collected_urls) + dom_data['urls']) if u not in observed_urls]
+        with timer.phase('validate'):
+            probed_images = extractor.validate_images(
+                [{'url': img_url} for img_url in probe_urls], referer=url, cookie=cookie)
+        validated_images = captured_images + probed_images
+
+        response_data = {
+            'success': True,
+            'url': url,
+            'total_found': len(captured_images) + len(probe_urls),
+            'valid_images': len(validated_images),
+            'images': validated_images,
+            'text_content': dom_data['textContent']
+        }
 
-            for u in dom_data['urls']:
-                collected_urls.add(u)
-
-            # 验证与获取信息
-            validated_images = []
-            for img_url in collected_urls:
-                if extractor.validate_image_url(img_url, referer=url, cookie=cookie):
-                    info = extractor.get_image_info(img_url, referer=url, cookie=cookie)
-                    img = {'url': img_url}
-                    img.update(info)
-                    validated_images.append(img)
-
-            response_data = {
-                'success': True,
-                'url': url,
-                'total_found': len(collected_urls),
-                'valid_images': len(validated_images),
-                'images': validated_images,
-                'text_content': dom_data['textContent']
+        if debug:
+            response_data['debug'] = {
+                'collected_urls_sample': ([img['url'] for img in captured_images] + probe_urls)[:10],
+                'dom_count': len(dom_data['urls']),
+                'captured_count': len(captured_images),
+                'probed_count': len(probe_urls),
+                'scroll': scroll_stats,
+                'requests': request_stats,
+                'timings_ms': timer.timings
             }
 
-            if debug:
-                response_data['debug'] = {
-                    'collected_urls_sample': list(collected_urls)[:10],
-                    'dom_count': len(dom_data['urls'])
-                }
-
-            context.close()
-            browser.close()
-
-            return jsonify(response_data)
+        return jsonify(response_data)
 
+    except (BrowserPoolBusy, BrowserPoolUnavailable) as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': f'渲染模式失败: {str(e)}'})
 
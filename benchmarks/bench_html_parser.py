@@ -0,0 +1,199 @@
+"""HTML 解析性能对比：BeautifulSoup(html.parser) + 多次 find_all vs lxml 单次遍历
+
+用法：python benchmarks/bench_html_parser.py [--items 3000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from services.html_parser import parse_html, scan_page
+
+BASE_URL = 'https://example.com/page'
+
+
+def build_page(items):
+    """构造一个包含大量图片、段落、脚本的页面"""
+    parts = [
+        '<html><head><title>Benchmark</title>',
+        '<meta property="og:image" content="/og.jpg">',
+        '<link rel="stylesheet" href="/a.css">',
+        '<style>.hero{background-image:url(/hero.jpg)}</style>',
+        '</head><body><nav><a href="/">首页</a></nav><main>',
+    ]
+    for i in range(items):
+        parts.append(f'<div class="card" style="background-image:url(/bg/{i}.png)">')
+        parts.append(f'<h3>标题 {i}</h3><p>这是第 {i} 段比较长的正文内容，用于测试文本提取。</p>')
+        parts.append(f'<img src="/img/{i}.jpg" alt="图片 {i}" width="100" height="80">')
+        parts.append(f'<picture><source srcset="/img/{i}.webp 1x"></picture>')
+        parts.append(f'<ul><li>项目 {i}</li><li><a href="/item/{i}">链接 {i}</a></li></ul>')
+        if i % 10 == 0:
+            parts.append(f'<script>var pic{i} = "https://cdn.example.com/p/{i}.jpg";</script>')
+            parts.append(f'<noscript><img src="/ns/{i}.jpg"></noscript>')
+            parts.append(f'<video poster="/poster/{i}.jpg"></video>')
+        parts.append('</div>')
+    parts.append('</main><footer>页脚</footer></body></html>')
+    return ''.join(parts)
+
+
+def legacy_extract_text_content(soup, url):
+    """改造前 ContentExtractor 的文字提取：在 BeautifulSoup 树上按选择器与 find_all 逐类提取"""
+    text_content = {
+        'title': '',
+        'main_content': '',
+        'headings': [],
+        'paragraphs': [],
+        'lists': [],
+        'links': [],
+        'full_text': ''
+    }
+
+    try:
+        # 提取标题
+        title_tag = soup.find('title')
+        if title_tag:
+            text_content['title'] = title_tag.get_text().strip()
+
+        # 提取主内容区域（优先选择article, main, content等语义化标签）
+        main_content_selectors = [
+            'article', 'main', '[role="main"]', '.content', '.main-content', 
+            '.post-content', '.article-content', '.entry-content',
+            '#content', '#main', '.container', 'body'
+        ]
+
+        main_element = None
+        for selector in main_content_selectors:
+            main_element = soup.select_one(selector)
+            if main_element:
+                break
+
+        if not main_element:
+            main_element = soup.find('body')
+
+        if main_element:
+            # 提取标题
+            headings = main_element.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+            for heading in headings:
+                heading_text = heading.get_text().strip()
+                if heading_text:
+                    text_content['headings'].append({
+                        'level': heading.name,
+                        'text': heading_text
+                    })
+
+            # 提取段落
+            paragraphs = main_element.find_all('p')
+            for p in paragraphs:
+                p_text = p.get_text().strip()
+                if p_text and len(p_text) > 10:  # 过滤太短的段落
+                    text_content['paragraphs'].append(p_text)
+
+            # 提取列表
+            lists = main_element.find_all(['ul', 'ol'])
+            for list_elem in lists:
+                list_items = []
+                for li in list_elem.find_all('li'):
+                    li_text = li.get_text().strip()
+                    if li_text:
+                        list_items.append(li_text)
+                if list_items:
+                    text_content['lists'].append({
+                        'type': list_elem.name,
+                        'items': list_items
+                    })
+
+            # 提取链接
+            links = main_element.find_all('a', href=True)
+            for link in links:
+                link_text = link.get_text().strip()
+                href = link.get('href')
+                if link_text and href:
+                    # 转换为绝对URL
+                    absolute_url = urljoin(url, href)
+                    text_content['links'].append({
+                        'text': link_text,
+                        'url': absolute_url
+                    })
+
+            # 提取完整文本内容
+            # 移除脚本和样式标签
+            for script in main_element(["script", "style", "nav", "header", "footer", "aside"]):
+                script.decompose()
+
+            # 获取纯文本
+            full_text = main_element.get_text()
+            # 清理文本
+            lines = [line.strip() for line in full_text.split('\n') if line.strip()]
+            text_content['full_text'] = '\n'.join(lines)
+
+            # 生成主要内容的摘要
+            if text_content['paragraphs']:
+                text_content['main_content'] = '\n\n'.join(text_content['paragraphs'][:5])  # 取前5个段落
+            elif text_content['full_text']:
+                # 如果没有段落，从完整文本中提取前500字符
+                text_content['main_content'] = text_content['full_text'][:500] + '...' if len(text_content['full_text']) > 500 else text_content['full_text']
+
+    except Exception as e:
+        print(f"文字提取错误: {e}")
+
+    return text_content
+
+
+def legacy_scan(html):
+    """改造前的做法：html.parser 建树，再对每类结构分别 find_all"""
+    soup = BeautifulSoup(html, 'html.parser')
+    soup.find_all('img')
+    soup.find_all('style')
+    soup.find_all('link', rel=lambda x: x and 'stylesheet' in x)
+    soup.find_all(attrs={'style': True})
+    for picture in soup.find_all('picture'):
+        picture.find_all('source')
+    soup.find_all('meta', attrs={'property': 'og:image'})
+    soup.find_all('meta', attrs={'property': 'og:image:url'})
+    soup.find_all('meta', attrs={'name': 'twitter:image'})
+    soup.find_all('meta', attrs={'itemprop': 'image'})
+    soup.find_all('noscript')
+    soup.find_all('video')
+    soup.find_all('script')
+    soup.find_all('script', type='application/json')
+    return legacy_extract_text_content(soup, BASE_URL)
+
+
+def lxml_scan(html):
+    return scan_page(parse_html(html), BASE_URL).text_content
+
+
+def timeit(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    html = build_page(args.items)
+
+    legacy = timeit(lambda: legacy_scan(html), args.repeat)
+    fast = timeit(lambda: lxml_scan(html), args.repeat)
+
+    print(f'页面大小: {len(html) / 1024:.0f} KB, 卡片数: {args.items}')
+    print(f'BeautifulSoup + find_all: {legacy * 1000:.1f} ms')
+    print(f'lxml 单次遍历:           {fast * 1000:.1f} ms')
+    print(f'加速比: {legacy / fast:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class BrowserPoolBusy(Exception):
+    """等待空闲浏览器超时"""
+
+
+class BrowserPoolUnavailable(Exception):
+    """所有浏览器线程都无法启动（Playwright 驱动或浏览器缺失等）"""
+
+
+def _descendant_rss_mb():
+    """当前进程所有子孙进程（Playwright 驱动与 Chromium）的常驻内存总和（MB）；非 Linux 返回 None"""
+    if not os.path.isdir('/proc'):
+        return None
+    children = {}
+    rss = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                stat = f.read()
+            # comm 字段可能包含空格，从最后一个 ')' 之后解析
+            fields = stat[stat.rindex(')') + 2:].split()
+            children.setdefault(int(fields[1]), []).append(int(name))
+            rss[int(name)] = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+    total = 0
+    stack = list(children.get(os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total / (1024 * 1024)
+
+
+class _BrowserWorker(threading.Thread):
+    """持有一个 Playwright 实例与 Chromium 进程的线程
+
+    Playwright 的同步 API 只能在创建它的线程里使用，所以浏览器由专门的线程持有，
+    其他线程通过任务队列提交渲染任务。
+    """
+
+    def __init__(self, pool, index):
+        super().__init__(name=f'browser-{index}', daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.pages_served = 0
+        self.launched_at = 0.0
+        self.launches = 0
+        self.error = None        # 线程异常退出的原因
+        self.failed_at = 0.0
+
+    def _launch(self):
+        self._close_browser()
+        self.browser = self.playwright.chromium.launch(**self.pool.launch_options)
+        self.pages_served = 0
+        self.launched_at = time.monotonic()
+        self.launches += 1
+
+    def _close_browser(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+
+    def _healthy(self):
+        if self.browser is None or not self.browser.is_connected():
+            return False
+        if self.pages_served >= self.pool.recycle_after:
+            return False
+        if self.pool.max_age and time.monotonic() - self.launched_at > self.pool.max_age:
+            return False
+        # 内存超限时只回收已经服务过页面的浏览器，避免刚启动的浏览器反复重启
+        return not (self.pages_served and self.pool.memory_exceeded())
+
+    @property
+    def usable(self):
+        return self.error is None and self.is_alive()
+
+    def run(self):
+        try:
+            from playwright.sync_api import sync_playwright
+
+            with sync_playwright() as playwright:
+                self.playwright = playwright
+                self._serve()
+        except Exception as e:
+            # 驱动启动失败或运行中崩溃：记录原因，由线程池决定是否让排队的任务失败
+            self.error = e
+            self.failed_at = time.monotonic()
+            self.pool._worker_failed(self, e)
+
+    def _serve(self):
+        while not self.pool.closed:
+            try:
+                job = self.pool.jobs.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                job = None
+            # 健康检查：断开、达到回收页数/时长、内存超限时重启浏览器
+            if not self._healthy():
+                try:
+                    self._launch()
+                except Exception as e:
+                    if job is not None and job[2].set_running_or_notify_cancel():
+                        job[2].set_exception(e)
+                    time.sleep(1)
+                    continue
+            if job is None:
+                continue
+            func, context_options, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._run_job(func, context_options, future)
+        self._close_browser()
+
+    def _run_job(self, func, context_options, future):
+        context = None
+        try:
+            # 每个请求一个独立的 BrowserContext：Cookie、缓存、存储互不影响
+            context = self.browser.new_context(**context_options)
+            result = func(context)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            self.pages_served += 1
+            if context is not None:
+                try:
+                    context.close()
+                except Exception:
+                    pass
+
+
+class BrowserPool:
+    """常驻的 Chromium 浏览器池，供各 Flask 线程共享
+
+    - browsers：常驻浏览器数，即同时渲染的页面数上限；多出的请求排队
+    - recycle_after：每个浏览器渲染这么多页面后重启，避免内存持续增长
+    - max_age：浏览器最长存活秒数，0 表示不限
+    - max_rss_mb：所有浏览器进程的常驻内存总和超过 browsers * max_rss_mb 时重启（仅 Linux）
+    - health_interval：空闲时的健康检查间隔（秒），浏览器断开会自动重新启动
+    - restart_interval：浏览器线程异常退出后，至少间隔这么久（秒）才在下次使用时重新启动
+    - 首次使用时才启动线程与浏览器；fork 出的子进程会重新启动自己的浏览器
+    - 所有线程都无法启动时，排队中的任务立即失败，新任务抛出 BrowserPoolUnavailable
+    """
+
+    def __init__(self, browsers=2, recycle_after=50, max_age=1800, max_rss_mb=1024,
+                 health_interval=30.0, launch_options=None, restart_interval=5.0):
+        self.browsers = max(1, int(browsers))
+        self.recycle_after = max(1, int(recycle_after))
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.health_interval = health_interval
+        self.launch_options = launch_options or {'headless': True}
+        self.restart_interval = restart_interval
+        self.jobs = queue.Queue()
+        self.closed = False
+        self._workers = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid and all(worker.usable for worker in self._workers):
+            return
+        with self._lock:
+            if self._pid != pid:
+                # 提前导入，未安装 Playwright 时在调用方线程抛出 ImportError
+                import playwright.sync_api  # noqa: F401
+                self.jobs = queue.Queue()
+                self._workers = [_BrowserWorker(self, i) for i in range(self.browsers)]
+                for worker in self._workers:
+                    worker.start()
+                self._pid = pid
+                return
+            # 重启异常退出的线程；刚失败的线程等 restart_interval 之后再试，避免每个请求都重新拉起驱动
+            now = time.monotonic()
+            for i, worker in enumerate(self._workers):
+                if not self.closed and not worker.usable and now - worker.failed_at >= self.restart_interval:
+                    replacement = _BrowserWorker(self, i)
+                    replacement.launches = worker.launches
+                    self._workers[i] = replacement
+                    replacement.start()
+
+    def _worker_failed(self, worker, error):
+        """线程异常退出时调用；没有其他可用线程时让排队中的任务立即失败，而不是等到超时"""
+        with self._lock:
+            if any(w.usable for w in self._workers if w is not worker):
+                return
+            while True:
+                try:
+                    _, _, future = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(BrowserPoolUnavailable(f'浏览器启动失败: {error}'))
+
+    def memory_exceeded(self):
+        if not self.max_rss_mb:
+            return False
+        rss = _descendant_rss_mb()
+        return rss is not None and rss > self.max_rss_mb * self.browsers
+
+    def run(self, func, context_options=None, timeout=120.0):
+        """在空闲浏览器的新 BrowserContext 中执行 func(context)，返回其结果
+
+        排队加执行超过 timeout 秒抛出 BrowserPoolBusy；func 的异常原样抛出。
+        """
+        self._ensure_started()
+        future = Future()
+        with self._lock:
+            # 与 _worker_failed 在同一把锁下判断：要么任务在线程失败前入队并被清理，要么这里直接失败
+            usable = [worker for worker in self._workers if worker.usable]
+            if not usable:
+                errors = [worker.error for worker in self._workers if worker.error is not None]
+                raise BrowserPoolUnavailable(f'浏览器启动失败: {errors[-1]}' if errors else '浏览器不可用')
+            self.jobs.put((func, context_options or {}, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise BrowserPoolBusy('渲染排队或执行超时，请稍后再试')
+
+    def stats(self):
+        return {
+            'browsers': self.browsers,
+            'queued': self.jobs.qsize(),
+            'workers': [
+                {
+                    'name': worker.name,
+                    'alive': worker.is_alive(),
+                    'error': str(worker.error) if worker.error is not None else None,
+                    'connected': bool(worker.browser is not None and worker.browser.is_connected()),
+                    'pages_served': worker.pages_served,
+                    'launches': worker.launches,
+                }
+                for worker in self._workers
+            ],
+        }
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,61 @@
+def base_url(url):
+    """去掉 query 和 fragment 后的 URL"""
+    return url.split('#', 1)[0].split('?', 1)[0]
+
+
+class CandidateCollector:
+    """候选图片收集器：保持发现顺序，按 URL 哈希 O(1) 判重，并合并重复条目的元数据
+
+    add(candidate) 精确判重：URL 相同视为重复，合并 alt/width/height/source。
+    add(candidate, loose=True) 宽松判重：用于脚本/JSON 中扫出的 URL，
+    除精确重复外，若它是已有 URL 去掉 query/fragment 后的形式（如已有 a.jpg?w=200 时
+    再发现 a.jpg），也视为重复并跳过。这是原先 `img_url in existing['url']` 子串判断
+    在实际中命中的情况的显式等价。
+    """
+
+    MERGE_FIELDS = ('alt', 'width', 'height')
+
+    def __init__(self):
+        self._by_url = {}
+        self._bases = set()
+
+    def __len__(self):
+        return len(self._by_url)
+
+    def __iter__(self):
+        return iter(self._by_url.values())
+
+    def __contains__(self, url):
+        return url in self._by_url
+
+    def covers(self, url):
+        """url 已收集，或是某个已收集 URL 的无 query 形式"""
+        return url in self._by_url or url in self._bases
+
+    def add(self, candidate, loose=False):
+        """加入候选图片；返回 True 表示新增，False 表示重复（已合并或跳过）"""
+        url = candidate.get('url')
+        if not url:
+            return False
+        existing = self._by_url.get(url)
+        if existing is not None:
+            self._merge(existing, candidate)
+            return False
+        if loose and url in self._bases:
+            return False
+        self._by_url[url] = candidate
+        self._bases.add(base_url(url))
+        return True
+
+    def _merge(self, existing, candidate):
+        for field in self.MERGE_FIELDS:
+            if not existing.get(field) and candidate.get(field):
+                existing[field] = candidate[field]
+        source = candidate.get('source', 'img')
+        if source != existing.get('source', 'img'):
+            sources = existing.setdefault('sources', [existing.get('source', 'img')])
+            if source not in sources:
+                sources.append(source)
+
+    def to_list(self):
+        return list(self._by_url.values())
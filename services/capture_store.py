@@ -0,0 +1,130 @@
+import hashlib
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future, wait
+
+from services.disk_store import DiskStore
+from services.image_header import describe_image, extension_for, url_extension
+
+# 渲染时按域名特征直接保存的图片 CDN（URL 不带图片后缀，响应头也不一定标明类型）
+CAPTURE_HOST_HINTS = ('byteimg.com', 'doubao')
+
+_CAPTURED_NAME = re.compile(r'^([0-9a-f]{16})\.[0-9a-z]+$')
+
+
+def is_capturable(url, content_type='', resource_type=''):
+    """渲染时的响应是否应作为图片保存：类型为图片、URL 带图片后缀，或来自已知的图片 CDN"""
+    if 'image' in (content_type or '').lower() or resource_type == 'image':
+        return True
+    if not url:
+        return False
+    if url_extension(url):
+        return True
+    lower = url.split('?', 1)[0].lower()
+    return any(hint in lower for hint in CAPTURE_HOST_HINTS)
+
+
+class CaptureBatch:
+    """一次渲染提交的保存任务；渲染结束后用 results() 取回本地地址与图片信息"""
+
+    def __init__(self, store):
+        self.store = store
+        self._jobs = []   # (source_url, Future)
+
+    def add(self, source_url, body, content_type=''):
+        """提交响应体，立即返回；哈希、解析与写盘由后台线程完成"""
+        self._jobs.append((source_url, self.store.submit(source_url, body, content_type)))
+
+    def results(self, timeout=10.0):
+        """等待本批任务完成，返回 [(source_url, local_url, info)]
+
+        info 为 describe_image 的结果，正文不是图片时为 None；保存失败时 local_url 为 None；
+        排队满或超时未处理的任务 local_url 为 None、info 为 False。
+        """
+        futures = [future for _, future in self._jobs]
+        if futures:
+            wait(futures, timeout=timeout)
+        results = []
+        for source_url, future in self._jobs:
+            local_url, info = None, False
+            if future.done() and not future.cancelled() and future.exception() is None:
+                local_url, info = future.result()
+            results.append((source_url, local_url, info))
+        return results
+
+
+class CaptureStore:
+    """渲染模式截获的图片响应体的本地存储（static/captured）
+
+    - 文件按内容寻址命名为 <sha256 前 16 位>.<扩展名>，相同内容只存一份
+    - 哈希、扩展名判断、尺寸解析与写盘都在后台线程完成，Playwright 的响应回调只负责入队
+    - 写入、LRU 淘汰与总大小限制（max_bytes）由 DiskStore 负责
+    - 目录不可写（如 Vercel 只读文件系统）时只解析不保存；队列满时不处理，调用方退回使用原始 URL
+    - 多进程各自持有写线程；fork 后自动重建
+    """
+
+    def __init__(self, root, url_prefix='/static/captured', max_bytes=512 * 1024 * 1024, queue_size=256):
+        self.disk = DiskStore(root, max_bytes, match=lambda name: _CAPTURED_NAME.match(name) is not None)
+        self.root = self.disk.root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self.enabled = self.disk.enabled
+        self._lock = threading.Lock()
+        self._jobs = None
+        self._pid = None
+
+    def batch(self):
+        return CaptureBatch(self)
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._jobs = queue.Queue(maxsize=self.queue_size)
+            threading.Thread(target=self._write_loop, name='capture-writer', daemon=True).start()
+            self._pid = pid
+
+    def submit(self, source_url, body, content_type=''):
+        """提交一个响应体，返回 Future，结果为 (本地 URL, 图片信息)"""
+        future = Future()
+        if not body:
+            future.set_result((None, None))
+            return future
+        self._ensure_started()
+        try:
+            self._jobs.put_nowait((source_url, body, content_type, future))
+        except queue.Full:
+            future.set_result((None, False))
+        return future
+
+    # —— 后台写线程 ——
+    def _write_loop(self):
+        while True:
+            source_url, body, content_type, future = self._jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                info = describe_image(body, content_type)
+                local_url = self._store(source_url, body, content_type) if info and self.enabled else None
+                future.set_result((local_url, info))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _store(self, source_url, body, content_type):
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        filename = f'{digest}.{extension_for(content_type, body[:16], source_url)}'
+        # 相同内容已保存过（包括其他进程保存的）时只标记为最近使用
+        if self.disk.touch(filename) or self.disk.write(filename, body) is not None:
+            return f'{self.url_prefix}/{filename}'
+        return None
+
+    def stats(self):
+        stats = self.disk.stats()
+        stats['queued'] = self._jobs.qsize() if self._jobs is not None else 0
+        return stats
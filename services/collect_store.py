@@ -0,0 +1,255 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _url_digest(url):
+    # 8 字节摘要足以做内存去重预判；最终以数据库的唯一约束为准
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+
+
+def utc_timestamp():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def is_http_url(url):
+    return isinstance(url, str) and url.strip().lower().startswith(('http://', 'https://'))
+
+
+def parse_batch(text, referer=''):
+    """解析批量上报的正文，返回 [{'url', 'referer'}]
+
+    支持：JSON 数组（元素为 URL 字符串或 {url, referer}）、{"urls": [...], "referer": ...}，
+    以及逐行的 URL 或 JSON 对象（NDJSON）。不是 http(s) 链接的条目直接丢弃。
+    """
+    text = text.strip()
+    if not text:
+        return []
+    items = []
+
+    def add(url, entry_referer=None):
+        if is_http_url(url):
+            items.append({'url': url.strip(), 'referer': entry_referer or referer})
+
+    if text[0] in '[{':
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            referer = payload.get('referer') or referer
+            payload = payload.get('urls') or payload.get('items') or ([payload] if payload.get('url') else [])
+        if isinstance(payload, list):
+            for entry in payload:
+                if isinstance(entry, str):
+                    add(entry)
+                elif isinstance(entry, dict):
+                    add(entry.get('url'), entry.get('referer'))
+            return items
+    # 逐行：每行一个 URL 或 JSON 对象
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                add(entry.get('url'), entry.get('referer'))
+        else:
+            add(line)
+    return items
+
+
+class CollectStore:
+    """手动模式收集的图片链接存储
+
+    - SQLite（WAL 模式）持久化，url 唯一约束保证跨进程去重，重启后数据仍在
+    - 内存中保存已见 URL 的摘要集合，重复上报 O(1) 判定，不进写队列
+    - 写入先进入队列，由后台线程每 flush_interval 秒或攒够 batch_size 条后一次事务批量写入
+    - 读取前先落盘本进程的待写数据，保证读到自己的写入
+    - 写入失败（如多进程写锁冲突 SQLITE_BUSY）时整批放回队列重试；连续失败 max_write_attempts 次后
+      丢弃该批，并从已见集合中移除，客户端重新上报时仍可写入
+    - 多进程（gunicorn worker）各自持有连接与写线程；fork 后自动重建
+    - 无法写文件（如 Vercel 只读文件系统）时退回内存数据库
+    """
+
+    def __init__(self, db_path, batch_size=200, flush_interval=0.5, max_write_attempts=5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_write_attempts = max_write_attempts
+        self._write_failures = 0
+        self._lock = threading.Lock()        # 保护连接
+        self._cond = threading.Condition()   # 保护写队列
+        self._pending = []
+        self._seen = set()
+        self._pid = None
+        self._db = None
+        self._writer = None
+        atexit.register(self.flush)
+
+    # —— 连接与后台线程 ——
+    def _connect(self):
+        try:
+            if self.db_path and self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            db = sqlite3.connect(self.db_path or ':memory:', check_same_thread=False, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('PRAGMA busy_timeout=10000')
+            self._create_schema(db)
+        except (sqlite3.Error, OSError):
+            db = sqlite3.connect(':memory:', check_same_thread=False)
+            self._create_schema(db)
+        return db
+
+    @staticmethod
+    def _create_schema(db):
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS collected ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL UNIQUE,'
+            ' referer TEXT NOT NULL DEFAULT \'\', ts TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        # 分页与筛选：按时间、按来源页前缀
+        db.execute('CREATE INDEX IF NOT EXISTS idx_collected_created ON collected(created_at)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_collected_referer ON collected(referer, id)')
+        db.commit()
+
+    def _ensure(self):
+        """首次使用或 fork 之后：打开连接、加载已见 URL、启动写线程"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._db = self._connect()
+            self._seen = {_url_digest(row[0]) for row in self._db.execute('SELECT url FROM collected')}
+            with self._cond:
+                self._pending = []
+            self._writer = threading.Thread(target=self._write_loop, name='collect-writer', daemon=True)
+            self._pid = pid
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(timeout=self.flush_interval)
+            if not self.flush():
+                # 写入失败后等一个周期再重试，避免队列已满时空转
+                time.sleep(self.flush_interval)
+
+    # —— 写入 ——
+    def add_many(self, items):
+        """批量加入 [{'url', 'referer', 'ts'}]，返回 (新增数, 重复数)；新增的条目异步落盘"""
+        self._ensure()
+        accepted = []
+        duplicates = 0
+        with self._cond:
+            for item in items:
+                url = (item.get('url') or '').strip()
+                if not url:
+                    continue
+                digest = _url_digest(url)
+                if digest in self._seen:
+                    duplicates += 1
+                    continue
+                self._seen.add(digest)
+                accepted.append((url, item.get('referer') or '', item.get('ts') or utc_timestamp(), time.time()))
+            if accepted:
+                self._pending.extend(accepted)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+        return len(accepted), duplicates
+
+    def add(self, url, referer='', ts=None):
+        """加入单条链接，返回是否为新链接"""
+        added, _ = self.add_many([{'url': url, 'referer': referer, 'ts': ts}])
+        return added > 0
+
+    def flush(self):
+        """把待写队列一次事务写入数据库；写入失败时返回 False"""
+        if self._db is None or self._pid != os.getpid():
+            return True
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return True
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        'INSERT OR IGNORE INTO collected (url, referer, ts, created_at) VALUES (?, ?, ?, ?)', batch)
+            except sqlite3.Error as e:
+                self._write_failed(batch, e)
+                return False
+            self._write_failures = 0
+        return True
+
+    def _write_failed(self, batch, error):
+        self._write_failures += 1
+        if self._write_failures < self.max_write_attempts:
+            logger.warning('收集链接写入失败（第 %d 次），%d 条放回队列重试: %s',
+                           self._write_failures, len(batch), error)
+            with self._cond:
+                self._pending[:0] = batch
+            return
+        logger.error('收集链接连续 %d 次写入失败，丢弃 %d 条: %s', self._write_failures, len(batch), error)
+        self._write_failures = 0
+        with self._cond:
+            self._seen.difference_update(_url_digest(row[0]) for row in batch)
+
+    # —— 读取 ——
+    def _query(self, sql, params=()):
+        self._ensure()
+        self.flush()
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def count(self):
+        return self._query('SELECT COUNT(*) FROM collected')[0][0]
+
+    def query(self, cursor=None, limit=100, referer=None, since=None, until=None):
+        """按 id 游标分页查询，返回 (items, next_cursor, has_more)
+
+        cursor 为上一页返回的 next_cursor（最后一条的 id），只返回其后的条目；
+        id 按提交顺序递增，轮询的客户端一直用 next_cursor 拉取即可拿到之后新增的全部条目。
+        referer 按前缀筛选；since / until 为 Unix 时间戳，按收集时间筛选。
+        """
+        where, params = [], []
+        if cursor:
+            where.append('id > ?')
+            params.append(int(cursor))
+        if referer:
+            # 前缀匹配写成区间比较，可以用上 referer 索引
+            where.append('referer >= ? AND referer < ?')
+            params.extend([referer, referer + '\uffff'])
+        if since is not None:
+            where.append('created_at >= ?')
+            params.append(float(since))
+        if until is not None:
+            where.append('created_at < ?')
+            params.append(float(until))
+        sql = 'SELECT id, url, referer, ts FROM collected'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id LIMIT ?'
+        params.append(int(limit) + 1)
+        rows = self._query(sql, params)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [{'id': row_id, 'url': url, 'referer': referer, 'ts': ts} for row_id, url, referer, ts in rows]
+        next_cursor = rows[-1][0] if rows else int(cursor or 0)
+        return items, next_cursor, has_more
@@ -0,0 +1,132 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin
+
+IMPORT_PATTERN = re.compile(r'@import\s+(?:url\(\s*)?["\']?([^"\')\s;]+)["\']?\s*\)?', re.IGNORECASE)
+
+
+class StylesheetFetcher:
+    """并发抓取外链样式表
+
+    - 共享截止时间：整批样式表（含 @import）在 deadline 秒内完成，超时的直接放弃
+    - 大小上限：单个样式表最多读取 max_bytes 字节，超出部分截断
+    - 缓存：按 URL 缓存正文与 ETag/Last-Modified，过期后用条件请求重新验证
+    - @import：按层递归解析，深度不超过 max_depth，总数不超过 max_sheets
+    """
+
+    def __init__(self, session, max_workers=8, deadline=15.0, timeout=8, max_bytes=2 * 1024 * 1024,
+                 max_depth=2, max_sheets=40, cache_size=500, cache_ttl=600):
+        self.session = session
+        self.deadline = deadline
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self.max_sheets = max_sheets
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='css-fetch')
+
+    def fetch_all(self, css_urls, referer=None, cookie=None):
+        """并发抓取样式表及其 @import，返回 [(css_url, css_text), ...]，按发现顺序排列"""
+        expires_at = time.monotonic() + self.deadline
+        seen = set()
+        order = []
+        in_flight = {}
+        results = {}
+
+        def submit(css_url, depth):
+            if css_url in seen or len(seen) >= self.max_sheets:
+                return
+            if not css_url.startswith(('http://', 'https://')):
+                return
+            seen.add(css_url)
+            order.append(css_url)
+            future = self._executor.submit(self.fetch, css_url, referer, cookie)
+            in_flight[future] = (css_url, depth)
+
+        for css_url in css_urls:
+            submit(css_url, 0)
+
+        try:
+            while in_flight:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(list(in_flight), timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    css_url, depth = in_flight.pop(future)
+                    try:
+                        css_text = future.result()
+                    except Exception:
+                        css_text = None
+                    if not css_text:
+                        continue
+                    results[css_url] = css_text
+                    if depth < self.max_depth:
+                        for imported in IMPORT_PATTERN.findall(css_text):
+                            submit(urljoin(css_url, imported), depth + 1)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        return [(css_url, results[css_url]) for css_url in order if css_url in results]
+
+    def fetch(self, css_url, referer=None, cookie=None):
+        """抓取单个样式表（带缓存），失败时返回 None"""
+        with self._lock:
+            entry = self._cache.get(css_url)
+            if entry is not None:
+                self._cache.move_to_end(css_url)
+        if entry is not None and entry['expires_at'] > time.time():
+            return entry['text']
+
+        headers = {}
+        if referer:
+            headers['Referer'] = referer
+        if cookie:
+            headers['Cookie'] = cookie
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with self.session.get(css_url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and entry is not None:
+                self._remember(css_url, entry['text'], entry.get('etag'), entry.get('last_modified'))
+                return entry['text']
+            if response.status_code != 200:
+                return None
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=16384):
+                body += chunk
+                if len(body) >= self.max_bytes:
+                    del body[self.max_bytes:]
+                    break
+            encoding = response.encoding or 'utf-8'
+            try:
+                text = body.decode(encoding, errors='ignore')
+            except LookupError:
+                text = body.decode('utf-8', errors='ignore')
+            etag = response.headers.get('etag')
+            last_modified = response.headers.get('last-modified')
+
+        self._remember(css_url, text, etag, last_modified)
+        return text
+
+    def _remember(self, css_url, text, etag, last_modified):
+        with self._lock:
+            self._cache[css_url] = {
+                'text': text,
+                'etag': etag,
+                'last_modified': last_modified,
+                'expires_at': time.time() + self.cache_ttl,
+            }
+            self._cache.move_to_end(css_url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,177 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# 临时文件前缀；以点开头，不会被当作缓存文件
+TMP_PREFIX = '.tmp-'
+
+
+class DiskStore:
+    """一个目录下的磁盘缓存文件：原子写入、按最近使用淘汰、限制总大小
+
+    - 写入先落到同目录的临时文件，再 os.replace 到目标文件名，读者不会看到写了一半的文件
+    - 内存索引：文件名 -> 字节数，按最近使用排序；命中时更新文件修改时间，
+      重建索引时按修改时间恢复顺序
+    - 多个进程（gunicorn worker）共用同一目录：每 rescan_interval 秒按目录重新统计，
+      计入其他进程写入的文件、去掉已被删除的文件，总大小上限对整个目录生效
+    - match(name) 决定哪些文件归本缓存管理；残留超过一小时的临时文件在重新统计时清理
+    - 目录不可写（如 Vercel 只读文件系统）时 enabled 为 False，调用方应跳过缓存
+    """
+
+    def __init__(self, root, max_bytes, match=None, rescan_interval=60.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.match = match or (lambda name: not name.startswith('.'))
+        self.rescan_interval = rescan_interval
+        self._files = OrderedDict()   # 文件名 -> 字节数
+        self._size = 0
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.enabled = os.access(self.root, os.W_OK)
+        except (OSError, PermissionError):
+            self.enabled = False
+
+    def path(self, name):
+        return self.root / name
+
+    def rescan(self):
+        """按目录内容重建索引并执行淘汰"""
+        files = []
+        now = time.time()
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if entry.name.startswith(TMP_PREFIX):
+                        if now - stat.st_mtime > 3600:
+                            unlink_quietly(entry.path)
+                    elif self.match(entry.name):
+                        files.append((stat.st_mtime, entry.name, stat.st_size))
+        except OSError:
+            files = None
+        with self._lock:
+            if files is not None:
+                self._files = OrderedDict((name, size) for _, name, size in sorted(files))
+                self._size = sum(self._files.values())
+            self._scanned_at = time.monotonic()
+            self._evict_locked()
+
+    def _maybe_rescan(self):
+        scanned_at = self._scanned_at
+        if scanned_at is None or time.monotonic() - scanned_at >= self.rescan_interval:
+            self.rescan()
+
+    def touch(self, name):
+        """文件存在时标记为最近使用并返回 True；不存在（如已被其他进程淘汰）时返回 False"""
+        if not self.enabled:
+            return False
+        self._maybe_rescan()
+        path = self.root / name
+        try:
+            os.utime(path)
+            size = path.stat().st_size
+        except OSError:
+            with self._lock:
+                self._forget_locked(name)
+            return False
+        with self._lock:
+            self._remember_locked(name, size)
+        return True
+
+    def mkstemp(self):
+        """在缓存目录中创建临时文件，返回 (fd, 路径)；用于边接收边写入的正文"""
+        return tempfile.mkstemp(dir=self.root, prefix=TMP_PREFIX)
+
+    def write(self, name, data):
+        """原子写入 data，返回文件路径；失败时返回 None"""
+        if not self.enabled:
+            return None
+        try:
+            fd, tmp_path = self.mkstemp()
+        except OSError:
+            return None
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        except OSError:
+            unlink_quietly(tmp_path)
+            return None
+        return self.commit(tmp_path, name)
+
+    def commit(self, tmp_path, name):
+        """把已写完的临时文件移动为 name，返回文件路径；失败时删除临时文件并返回 None
+
+        按内容命名的文件已存在时直接复用，丢弃临时文件。
+        """
+        self._maybe_rescan()
+        path = self.root / name
+        try:
+            if path.exists():
+                unlink_quietly(tmp_path)
+                os.utime(path)
+            else:
+                os.replace(tmp_path, path)
+            size = path.stat().st_size
+        except OSError:
+            unlink_quietly(tmp_path)
+            return None
+        with self._lock:
+            self._remember_locked(name, size)
+            self._evict_locked()
+            if name not in self._files:
+                # 单个文件就超过了上限
+                return None
+        return path
+
+    def discard(self, name):
+        with self._lock:
+            self._forget_locked(name)
+        unlink_quietly(self.root / name)
+
+    def clear(self):
+        self.rescan()
+        with self._lock:
+            names = list(self._files)
+            self._files.clear()
+            self._size = 0
+        for name in names:
+            unlink_quietly(self.root / name)
+
+    def _remember_locked(self, name, size):
+        self._size += size - self._files.pop(name, 0)
+        self._files[name] = size
+
+    def _forget_locked(self, name):
+        self._size -= self._files.pop(name, 0)
+
+    def _evict_locked(self):
+        while self._files and self._size > self.max_bytes:
+            name, size = self._files.popitem(last=False)
+            self._size -= size
+            unlink_quietly(self.root / name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'files': len(self._files),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,265 @@
+import lxml.html
+from lxml import etree
+from urllib.parse import urljoin
+
+# 主内容区域的候选选择器（按优先级），与改造前的 BeautifulSoup 文字提取保持一致
+MAIN_CONTENT_SELECTORS = [
+    ('tag', 'article'), ('tag', 'main'), ('role', 'main'), ('class', 'content'),
+    ('class', 'main-content'), ('class', 'post-content'), ('class', 'article-content'),
+    ('class', 'entry-content'), ('id', 'content'), ('id', 'main'), ('class', 'container'),
+    ('tag', 'body'),
+]
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# 计算完整文本时跳过的标签
+TEXT_EXCLUDED_TAGS = {'script', 'style', 'nav', 'header', 'footer', 'aside'}
+META_IMAGE_ATTRS = [
+    ('property', 'og:image'), ('property', 'og:image:url'),
+    ('name', 'twitter:image'), ('itemprop', 'image'),
+]
+
+
+class PageScan:
+    """单次遍历得到的页面信息：所有可能包含图片的结构，以及文字内容"""
+
+    def __init__(self):
+        self.title = None
+        self.imgs = []              # <img> 的属性字典
+        self.style_texts = []       # <style> 正文
+        self.stylesheet_hrefs = []  # <link rel=stylesheet> 的 href
+        self.inline_styles = []     # 元素 style 属性
+        self.picture_srcsets = []   # <picture> 内 <source> 的 srcset
+        self.meta_images = []       # og:image / twitter:image 等 meta 的 content
+        self.noscript_imgs = []     # <noscript> 内 <img> 的属性字典
+        self.video_posters = []     # <video poster>
+        self.scripts = []           # <script> 正文
+        self.json_scripts = []      # <script type="application/json"> 正文
+        self.img_tags_count = 0
+        self.script_tags_count = 0
+        self.text_content = empty_text_content()
+
+
+def empty_text_content():
+    return {
+        'title': '',
+        'main_content': '',
+        'headings': [],
+        'paragraphs': [],
+        'lists': [],
+        'links': [],
+        'full_text': ''
+    }
+
+
+def parse_html(content):
+    """用 lxml 解析 HTML，返回文档根节点；content 可以是 str 或 bytes"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    # 使用 etree 的 HTMLParser，避免 lxml.html 为每个节点查找 HtmlElement 类的开销
+    parser = etree.HTMLParser(encoding='utf-8')
+    try:
+        root = etree.fromstring(content, parser)
+    except etree.XMLSyntaxError:
+        root = None
+    if root is None:
+        # 空文档：返回一个空页面，后续按“没有图片”处理
+        root = etree.fromstring(b'<html><body></body></html>', parser)
+    return root
+
+
+def serialize_html(root):
+    """将文档树序列化为 HTML 字符串（用于调试输出）"""
+    return etree.tostring(root, encoding='unicode', method='html')
+
+
+# 元素内的全部文本，不含 script/style 的内容（与 BeautifulSoup 的 get_text 一致）
+_TEXT_XPATH = etree.XPath('descendant::text()[not(parent::script or parent::style)]')
+
+
+def _text_of(el):
+    return ''.join(_TEXT_XPATH(el))
+
+
+def _matches_selector(el, kind, value):
+    if kind == 'tag':
+        return el.tag == value
+    if kind == 'role':
+        return el.get('role') == value
+    if kind == 'class':
+        return value in (el.get('class') or '').split()
+    return el.get('id') == value
+
+
+def scan_page(root, url):
+    """单次遍历文档树，收集图片相关结构与文字内容
+
+    遍历使用 start/end 事件，记录每个元素的先序编号，以便在遍历结束后
+    直接判断某个元素是否位于选中的主内容区域内，而无需再次遍历。
+    """
+    scan = PageScan()
+    # 主内容区域：只需记录优先级最高的选择器的首个命中元素，
+    # 因此每个元素只需检查比当前命中优先级更高的选择器
+    main_element = None
+    main_priority = len(MAIN_CONTENT_SELECTORS)
+    spans = {}           # element -> [start, end]
+    headings = []        # (index, element)
+    paragraphs = []
+    lists = []           # (index, element, items)
+    open_lists = []
+    links = []
+    pieces = []          # (index, is_tail, innermost_excluded_index, text)
+    excluded_stack = []
+    index = 0
+
+    # iterwalk 不产出注释节点，先剥离注释，使其后的文本并入相邻文本
+    etree.strip_tags(root, etree.Comment, etree.ProcessingInstruction)
+    for event, el in etree.iterwalk(root, events=('start', 'end')):
+        tag = el.tag
+        if not isinstance(tag, str):
+            continue
+
+        if event == 'start':
+            index += 1
+            spans[el] = [index, index]
+            if tag in TEXT_EXCLUDED_TAGS:
+                excluded_stack.append(index)
+            if el.text:
+                pieces.append((index, False, excluded_stack[-1] if excluded_stack else -1, el.text))
+
+            for i in range(main_priority):
+                kind, value = MAIN_CONTENT_SELECTORS[i]
+                if _matches_selector(el, kind, value):
+                    main_element, main_priority = el, i
+                    break
+
+            if el.get('style') is not None:
+                scan.inline_styles.append(el.get('style', ''))
+
+            if tag == 'img':
+                scan.img_tags_count += 1
+                scan.imgs.append(dict(el.attrib))
+            elif tag == 'title':
+                if scan.title is None:
+                    scan.title = _text_of(el)
+            elif tag == 'style':
+                if el.text:
+                    scan.style_texts.append(el.text)
+            elif tag == 'link':
+                rel = (el.get('rel') or '').lower().split()
+                if 'stylesheet' in rel and el.get('href'):
+                    scan.stylesheet_hrefs.append(el.get('href'))
+            elif tag == 'source':
+                if el.get('srcset') and any(a.tag == 'picture' for a in el.iterancestors()):
+                    scan.picture_srcsets.append(el.get('srcset'))
+            elif tag == 'meta':
+                if any(el.get(attr) == value for attr, value in META_IMAGE_ATTRS):
+                    if el.get('content'):
+                        scan.meta_images.append(el.get('content'))
+            elif tag == 'noscript':
+                _collect_noscript_imgs(el, scan.noscript_imgs)
+            elif tag == 'video':
+                if el.get('poster'):
+                    scan.video_posters.append(el.get('poster'))
+            elif tag == 'script':
+                scan.script_tags_count += 1
+                if el.text:
+                    scan.scripts.append(el.text)
+                    if el.get('type') == 'application/json':
+                        scan.json_scripts.append(el.text)
+            elif tag in HEADING_TAGS:
+                headings.append((index, el))
+            elif tag == 'p':
+                paragraphs.append((index, el))
+            elif tag in ('ul', 'ol'):
+                record = (index, el, [])
+                lists.append(record)
+                open_lists.append(record)
+            elif tag == 'li' and open_lists:
+                li_text = _text_of(el).strip()
+                if li_text:
+                    for record in open_lists:
+                        record[2].append(li_text)
+            elif tag == 'a':
+                if el.get('href'):
+                    links.append((index, el))
+        else:
+            spans[el][1] = index
+            if tag in TEXT_EXCLUDED_TAGS and excluded_stack:
+                excluded_stack.pop()
+            if tag in ('ul', 'ol') and open_lists and open_lists[-1][1] is el:
+                open_lists.pop()
+            if el.tail:
+                pieces.append((spans[el][0], True, excluded_stack[-1] if excluded_stack else -1, el.tail))
+
+    if scan.title is not None:
+        scan.text_content['title'] = scan.title.strip()
+
+    if main_element is not None:
+        _fill_text_content(scan.text_content, spans[main_element], headings, paragraphs, lists, links, pieces, url)
+    return scan
+
+
+def _collect_noscript_imgs(noscript, out):
+    """noscript 内容可能被解析为元素，也可能是原始文本"""
+    found = False
+    for img in noscript.iter('img'):
+        found = True
+        out.append(dict(img.attrib))
+    if not found and noscript.text and '<img' in noscript.text.lower():
+        try:
+            for fragment in lxml.html.fragments_fromstring(noscript.text):
+                if isinstance(fragment, str):
+                    continue
+                for img in fragment.iter('img'):
+                    out.append(dict(img.attrib))
+        except (etree.ParserError, ValueError):
+            pass
+
+
+def _fill_text_content(text_content, span, headings, paragraphs, lists, links, pieces, url):
+    start, end = span
+
+    def inside(i):
+        return start <= i <= end
+
+    for i, el in headings:
+        if inside(i):
+            heading_text = _text_of(el).strip()
+            if heading_text:
+                text_content['headings'].append({'level': el.tag, 'text': heading_text})
+
+    for i, el in paragraphs:
+        if inside(i):
+            p_text = _text_of(el).strip()
+            if p_text and len(p_text) > 10:  # 过滤太短的段落
+                text_content['paragraphs'].append(p_text)
+
+    for i, el, items in lists:
+        if inside(i) and items:
+            text_content['lists'].append({'type': el.tag, 'items': items})
+
+    for i, el in links:
+        if inside(i):
+            link_text = _text_of(el).strip()
+            href = el.get('href')
+            if link_text and href:
+                text_content['links'].append({'text': link_text, 'url': urljoin(url, href)})
+
+    # 完整文本：主区域内的文本，跳过主区域内 script/style/nav 等元素的内容
+    texts = []
+    for i, is_tail, excluded_at, text in pieces:
+        if is_tail:
+            if not (start < i <= end):
+                continue
+        elif not inside(i):
+            continue
+        if excluded_at > start:
+            continue
+        texts.append(text)
+    lines = [line.strip() for line in ''.join(texts).split('\n') if line.strip()]
+    text_content['full_text'] = '\n'.join(lines)
+
+    if text_content['paragraphs']:
+        text_content['main_content'] = '\n\n'.join(text_content['paragraphs'][:5])  # 取前5个段落
+    elif text_content['full_text']:
+        full_text = text_content['full_text']
+        text_content['main_content'] = full_text[:500] + '...' if len(full_text) > 500 else full_text
@@ -0,0 +1,239 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+class HostLimitTimeout(requests.exceptions.RequestException):
+    """等待同一主机的并发名额超时
+
+    这是本地排队超时，请求并未发出，不代表上游不可用（熔断器不应计为失败）。
+    """
+
+
+_deadline = threading.local()
+
+
+@contextmanager
+def request_deadline(expires_at):
+    """在当前线程内为请求设置截止时刻（time.monotonic() 时间）：等待主机并发名额的时间不会超过它"""
+    previous = getattr(_deadline, 'expires_at', None)
+    _deadline.expires_at = expires_at
+    try:
+        yield
+    finally:
+        _deadline.expires_at = previous
+
+
+def _keepalive_options(idle):
+    """TCP keep-alive：空闲 idle 秒后开始探测，避免长连接被中间设备静默断开"""
+    options = list(HTTPConnection.default_socket_options)
+    if not idle:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(idle)))
+    elif hasattr(socket, 'TCP_KEEPALIVE'):  # macOS
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, int(idle)))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(idle) // 4)))
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4))
+    return options
+
+
+class HostLimiter:
+    """按主机限制同时在途的请求数，并记录每个主机的使用情况
+
+    等待名额最多 acquire_timeout 秒，且不超过 request_deadline 设置的截止时刻。
+    最多保留 max_hosts 个主机的状态；超出时淘汰最久未使用且当前没有请求的主机。
+    """
+
+    def __init__(self, per_host=8, acquire_timeout=30.0, max_hosts=256):
+        self.per_host = max(1, int(per_host))
+        self.acquire_timeout = acquire_timeout
+        self.max_hosts = max_hosts
+        self._lock = threading.Lock()
+        # host -> {'semaphore', 'users', 'in_flight', 'peak', 'requests', 'waited', 'wait_seconds', 'errors'}
+        self._hosts = OrderedDict()
+
+    def _acquire_state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = {
+                    'semaphore': threading.BoundedSemaphore(self.per_host),
+                    'users': 0, 'in_flight': 0, 'peak': 0, 'requests': 0,
+                    'waited': 0, 'wait_seconds': 0.0, 'errors': 0,
+                }
+                self._hosts[host] = state
+                self._evict_locked()
+            self._hosts.move_to_end(host)
+            # users 包含正在排队的请求，计数不为 0 的主机不会被淘汰
+            state['users'] += 1
+            return state
+
+    def _evict_locked(self):
+        excess = len(self._hosts) - self.max_hosts
+        if excess <= 0:
+            return
+        for host in [h for h, state in self._hosts.items() if state['users'] == 0][:excess]:
+            del self._hosts[host]
+
+    @contextmanager
+    def slot(self, host):
+        state = self._acquire_state(host)
+        try:
+            with self._slot(host, state):
+                yield
+        finally:
+            with self._lock:
+                state['users'] -= 1
+
+    @contextmanager
+    def _slot(self, host, state):
+        semaphore = state['semaphore']
+        started = time.monotonic()
+        if not semaphore.acquire(blocking=False):
+            timeout = self.acquire_timeout
+            expires_at = getattr(_deadline, 'expires_at', None)
+            if expires_at is not None:
+                timeout = max(0.0, min(timeout, expires_at - started))
+            if not semaphore.acquire(timeout=timeout):
+                with self._lock:
+                    state['errors'] += 1
+                raise HostLimitTimeout(f'等待 {host} 的并发名额超时')
+            with self._lock:
+                state['waited'] += 1
+                state['wait_seconds'] += time.monotonic() - started
+        with self._lock:
+            state['in_flight'] += 1
+            state['requests'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                state['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                state['in_flight'] -= 1
+            semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: {key: (round(value, 3) if isinstance(value, float) else value)
+                       for key, value in state.items() if key not in ('semaphore', 'users')}
+                for host, state in self._hosts.items()
+            }
+
+
+class PooledAdapter(HTTPAdapter):
+    """带主机并发限制与 keep-alive 设置的 HTTPAdapter"""
+
+    def __init__(self, limiter, keepalive_idle=60, **kwargs):
+        self.limiter = limiter
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault('socket_options', _keepalive_options(self.keepalive_idle))
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        # 名额覆盖到收到响应头为止；stream=True 时正文读取期间连接仍由连接池管理
+        with self.limiter.slot(urlsplit(request.url).netloc.lower()):
+            return super().send(request, **kwargs)
+
+
+class HTTPPool:
+    """上游连接池配置
+
+    - pool_hosts：保留连接池的主机数（超出后最久未用的主机连接池被关闭）
+    - pool_maxsize：每个主机保留的空闲长连接数，应不小于 per_host，避免并发高时用完即弃
+    - per_host：每个主机同时在途的请求数上限，超出的请求排队等待
+    - retries / backoff：连接失败与 502/503/504 的重试次数及指数退避系数，
+      由 urllib3 在连接池内重试，复用已有连接；mount(session, retries=False) 的会话不重试
+    - keepalive_idle：TCP keep-alive 空闲探测时间（秒），0 表示不设置
+    - acquire_timeout：等待主机并发名额的最长秒数，超时抛出 HostLimitTimeout
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, pool_hosts=32, pool_maxsize=16, per_host=8, retries=2, backoff=0.3,
+                 keepalive_idle=60, acquire_timeout=30.0):
+        self.pool_hosts = pool_hosts
+        self.pool_maxsize = max(pool_maxsize, per_host)
+        self.limiter = HostLimiter(per_host=per_host, acquire_timeout=acquire_timeout)
+        self.retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+        )
+        self.adapter = PooledAdapter(
+            self.limiter,
+            keepalive_idle=keepalive_idle,
+            pool_connections=pool_hosts,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.retry,
+        )
+        # 不在连接池内重试的适配器，供自行控制重试与截止时间的调用方使用；与 adapter 共用连接池
+        self.no_retry_adapter = PooledAdapter(
+            self.limiter,
+            keepalive_idle=keepalive_idle,
+            pool_connections=pool_hosts,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0,
+        )
+        self.no_retry_adapter.poolmanager = self.adapter.poolmanager
+
+    def mount(self, session, retries=True):
+        """把连接池挂到 session 上；retries=False 时连接失败与 502/503/504 不在连接池内重试"""
+        adapter = self.adapter if retries else self.no_retry_adapter
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def stats(self):
+        """连接池使用情况：各主机连接池的连接数/空闲数，以及并发名额的使用统计"""
+        pools = {}
+        manager = self.adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            # 队列中预先填充了 None 占位，只统计真实的空闲连接
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            pools[f'{key.key_scheme}://{key.key_host}:{key.key_port}'] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': idle,
+                'maxsize': self.pool_maxsize,
+            }
+        return {
+            'config': {
+                'pool_hosts': self.pool_hosts,
+                'pool_maxsize': self.pool_maxsize,
+                'per_host': self.limiter.per_host,
+                'retries': self.retry.total,
+                'backoff': self.retry.backoff_factor,
+                'keepalive_idle': self.adapter.keepalive_idle,
+                'acquire_timeout': self.limiter.acquire_timeout,
+            },
+            'pools': pools,
+            'hosts': self.limiter.stats(),
+        }
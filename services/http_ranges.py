@@ -0,0 +1,136 @@
+import os
+import uuid
+
+from flask import Response
+from werkzeug.http import parse_date, unquote_etag
+
+# 单个请求最多接受的区间数，超过时按整体返回（防止构造大量小区间放大开销）
+MAX_RANGES = 16
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """所有区间都超出了资源长度"""
+
+
+def parse_ranges(header, size):
+    """解析 Range 头，返回按起点排序并合并后的 [(start, stop)]（stop 不含）
+
+    没有 Range 头、单位不是 bytes、语法错误或区间过多时返回 None（按整体返回）；
+    所有区间都无法满足时抛出 RangeNotSatisfiable。
+    """
+    if not header:
+        return None
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    parts = [part.strip() for part in spec.split(',') if part.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, sep, last = part.partition('-')
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        if not first:
+            # 后缀区间：最后 N 个字节
+            if not last.isdigit():
+                return None
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(0, size - length), size))
+            continue
+        if not first.isdigit() or (last and not last.isdigit()):
+            return None
+        start = int(first)
+        stop = size if not last else min(int(last) + 1, size)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, stop))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # 重叠或相邻的区间合并为一个
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, stop in ranges[1:]:
+        last_start, last_stop = merged[-1]
+        if start <= last_stop:
+            merged[-1] = (last_start, max(last_stop, stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def if_range_matches(header, etag=None, last_modified=None):
+    """If-Range 校验：没有该头或校验值一致时才允许按区间返回
+
+    ETag 需强比较；日期需与 Last-Modified 完全相等。
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        if not etag:
+            return False
+        value, weak = unquote_etag(header)
+        current, current_weak = unquote_etag(etag)
+        return not weak and not current_weak and value == current
+    if not last_modified:
+        return False
+    date = parse_date(header)
+    return date is not None and date == parse_date(last_modified)
+
+
+def _iter_file(path, ranges, chunk_size, parts=None):
+    with open(path, 'rb') as f:
+        for index, (start, stop) in enumerate(ranges):
+            if parts is not None:
+                yield parts[index]
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+        if parts is not None:
+            yield parts[-1]
+
+
+def range_response(path, ranges, content_type, size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按区间从文件返回 206：单区间直接返回片段，多区间返回 multipart/byteranges"""
+    size = os.path.getsize(path) if size is None else size
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        resp = Response(_iter_file(path, ranges, chunk_size), status=206, mimetype=content_type)
+        resp.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        resp.headers['Content-Length'] = str(stop - start)
+        return resp
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for start, stop in ranges:
+        parts.append(
+            f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n'.encode('latin-1')
+        )
+    # 每个片段后跟 CRLF，再接下一个分隔符
+    parts = [parts[0]] + [b'\r\n' + part for part in parts[1:]] + [f'\r\n--{boundary}--\r\n'.encode('latin-1')]
+    length = sum(len(part) for part in parts) + sum(stop - start for start, stop in ranges)
+    resp = Response(_iter_file(path, ranges, chunk_size, parts), status=206,
+                    content_type=f'multipart/byteranges; boundary={boundary}')
+    resp.headers['Content-Length'] = str(length)
+    return resp
+
+
+def not_satisfiable_response(size):
+    resp = Response(status=416)
+    resp.headers['Content-Range'] = f'bytes */{size}'
+    return resp
@@ -0,0 +1,283 @@
+import io
+import struct
+
+from PIL import Image, ImageFile
+
+# 首个 Range 窗口大小，以及单张图片最多读取的字节数
+DEFAULT_PROBE_WINDOW = 64 * 1024
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+# 不携带长度字段的 JPEG 标记（TEM、RST0-7、SOI、EOI）
+_JPEG_STANDALONE = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9}
+# SOF 标记：C0-CF，排除 DHT(C4)、JPG(C8)、DAC(CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_format(data):
+    """根据魔数判断图片格式
+
+    返回 'JPEG' / 'PNG' / 'GIF' / 'WEBP' / 'BMP'；数据不足以判断时返回 ''；
+    无法识别时返回 None。
+    """
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'GIF'
+    if data.startswith(b'BM'):
+        return 'BMP'
+    if data.startswith(b'RIFF'):
+        # RIFF 容器需要 12 字节才能确认是 WebP
+        if len(data) < 12:
+            return ''
+        return 'WEBP' if data[8:12] == b'WEBP' else None
+    if len(data) < 8:
+        return ''
+    return None
+
+
+def is_image_content(content_type, head):
+    """响应是否为图片：Content-Type 为 image/*，或正文开头的魔数是图片"""
+    return (content_type or '').strip().lower().startswith('image/') or looks_like_image(bytes(head[:16]))
+
+
+def needs_more_ranges(head, content_type=''):
+    """第一个窗口没能解析出尺寸时，是否值得继续按 Range 请求后续窗口
+
+    只有魔数可识别的格式（如带大块 EXIF 的 JPEG）才继续；SVG、AVIF 与无法识别的格式读完第一个窗口即停止。
+    """
+    if any(kind in (content_type or '').lower() for kind in ('svg', 'avif')):
+        return False
+    return bool(sniff_format(bytes(head[:16])))
+
+
+def looks_like_image(data):
+    """简单魔数判断：JPEG / PNG / GIF / BMP / RIFF(WebP) / ICO"""
+    return bool(data) and (
+        data.startswith(b'\xff\xd8\xff') or
+        data.startswith(b'\x89PNG\r\n\x1a\n') or
+        data.startswith(b'GIF87a') or data.startswith(b'GIF89a') or
+        data.startswith(b'BM') or
+        data.startswith(b'RIFF') or  # WEBP/AVI 容器（后续由解析器进一步判定）
+        data.startswith(b'\x00\x00\x01\x00')  # ICO
+    )
+
+
+def _parse_png(data):
+    if len(data) < 24:
+        return None
+    if data[12:16] != b'IHDR':
+        raise ValueError('PNG 缺少 IHDR')
+    return struct.unpack('>II', data[16:24])
+
+
+def _parse_gif(data):
+    if len(data) < 10:
+        return None
+    return struct.unpack('<HH', data[6:10])
+
+
+def _parse_bmp(data):
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack('<I', data[14:18])[0]
+    if header_size == 12:
+        # OS/2 BITMAPCOREHEADER：16 位宽高
+        return struct.unpack('<HH', data[18:22])
+    width, height = struct.unpack('<ii', data[18:26])
+    # 高度为负表示自上而下存储
+    return abs(width), abs(height)
+
+
+def _parse_webp(data):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        if data[23:26] != b'\x9d\x01\x2a':
+            raise ValueError('VP8 起始码无效')
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        if data[20] != 0x2F:
+            raise ValueError('VP8L 签名无效')
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (b0 | ((b1 & 0x3F) << 8))
+        height = 1 + ((b1 >> 6) | (b2 << 2) | ((b3 & 0x0F) << 10))
+        return width, height
+    if chunk == b'VP8X':
+        width = 1 + int.from_bytes(data[24:27], 'little')
+        height = 1 + int.from_bytes(data[27:30], 'little')
+        return width, height
+    raise ValueError('未知的 WebP 块')
+
+
+def _parse_jpeg(data):
+    offset = 2
+    length = len(data)
+    while True:
+        # 跳到下一个标记（允许多个 0xFF 填充字节）
+        while offset < length and data[offset] != 0xFF:
+            offset += 1
+        while offset < length and data[offset] == 0xFF:
+            offset += 1
+        if offset >= length:
+            return None
+        marker = data[offset]
+        offset += 1
+        if marker in _JPEG_STANDALONE:
+            continue
+        if offset + 2 > length:
+            return None
+        segment_length = struct.unpack('>H', data[offset:offset + 2])[0]
+        if marker in _JPEG_SOF:
+            if offset + 7 > length:
+                return None
+            height, width = struct.unpack('>HH', data[offset + 3:offset + 7])
+            return width, height
+        offset += segment_length
+
+
+_PARSERS = {
+    'JPEG': _parse_jpeg,
+    'PNG': _parse_png,
+    'GIF': _parse_gif,
+    'WEBP': _parse_webp,
+    'BMP': _parse_bmp,
+}
+
+
+def parse_image_header(data):
+    """从图片开头的字节中解析格式与尺寸
+
+    成功时返回 {'format', 'width', 'height'}；数据不足或格式不支持时返回 None。
+    """
+    fmt = sniff_format(data)
+    if not fmt:
+        return None
+    try:
+        size = _PARSERS[fmt](data)
+    except (ValueError, struct.error, IndexError):
+        return None
+    if not size:
+        return None
+    return {'format': fmt, 'width': size[0], 'height': size[1]}
+
+
+class ImageHeaderReader:
+    """增量解析图片头部：逐块喂入字节，解析出尺寸后即可停止读取
+
+    常见格式（JPEG/PNG/GIF/WebP/BMP）直接解析头部；其他格式交给 PIL 的增量解析器。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.buffer = bytearray()
+        self.result = None
+        self._pil_parser = None
+
+    @property
+    def done(self):
+        return self.result is not None or len(self.buffer) >= self.max_bytes
+
+    def feed(self, chunk):
+        """喂入一块数据；返回 True 表示无需继续读取"""
+        if self.done or not chunk:
+            return self.done
+        self.buffer += chunk
+        fmt = sniff_format(self.buffer)
+        if fmt:
+            self.result = parse_image_header(self.buffer)
+        elif fmt is None:
+            self._feed_pil(chunk)
+        return self.done
+
+    def _feed_pil(self, chunk):
+        if self._pil_parser is None:
+            self._pil_parser = ImageFile.Parser()
+            chunk = bytes(self.buffer)
+        try:
+            self._pil_parser.feed(chunk)
+        except Exception:
+            return
+        image = self._pil_parser.image
+        if image is not None:
+            self.result = {'format': image.format, 'width': image.size[0], 'height': image.size[1]}
+
+    def close(self):
+        """结束读取，返回解析结果；快速解析失败时用 PIL 对已读字节做最后一次尝试"""
+        if self.result is None and self.buffer:
+            try:
+                image = Image.open(io.BytesIO(bytes(self.buffer)))
+                self.result = {'format': image.format, 'width': image.size[0], 'height': image.size[1]}
+            except Exception:
+                pass
+        return self.result
+
+
+def total_size_from_headers(headers, ranged=False):
+    """从响应头中取图片总大小：206 响应读 Content-Range 的总长度，否则读 Content-Length"""
+    if ranged:
+        content_range = headers.get('content-range', '')
+        total = content_range.rsplit('/', 1)[-1].strip()
+        if total.isdigit():
+            return int(total)
+        return 0
+    try:
+        return int(headers.get('content-length', '0'))
+    except ValueError:
+        return 0
+
+
+def describe_image(body, content_type=''):
+    """根据完整的图片正文生成与探测结果相同结构的信息；正文不是图片时返回 None"""
+    if not body:
+        return None
+    content_type = content_type or ''
+    if 'image' not in content_type.lower() and not looks_like_image(body[:16]):
+        return None
+    reader = ImageHeaderReader()
+    reader.feed(body[:reader.max_bytes])
+    header = reader.close() or {}
+    return {
+        'valid': True,
+        'content_type': content_type,
+        'size': len(body),
+        'width': header.get('width', 'unknown'),
+        'height': header.get('height', 'unknown'),
+        'format': header.get('format', 'unknown')
+    }
+
+
+# 内容类型关键字 -> 本地文件扩展名
+_CONTENT_TYPE_EXTENSIONS = [
+    ('png', 'png'), ('gif', 'gif'), ('webp', 'webp'), ('svg', 'svg'),
+    ('bmp', 'bmp'), ('icon', 'ico'), ('tiff', 'tiff'), ('avif', 'avif'),
+]
+_FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp', 'BMP': 'bmp'}
+
+
+# URL 后缀可直接作为扩展名的图片类型
+URL_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp', 'ico', 'tiff', 'avif'}
+
+
+def url_extension(url):
+    """URL 路径的图片扩展名（小写，不含点）；不是图片后缀时返回 None"""
+    path = (url or '').split('?', 1)[0].split('#', 1)[0].lower()
+    if '.' not in path.rsplit('/', 1)[-1]:
+        return None
+    ext = path.rsplit('.', 1)[-1]
+    return ext if ext in URL_IMAGE_EXTENSIONS else None
+
+
+def extension_for(content_type=None, head=b'', url=None):
+    """推断图片保存时的扩展名：优先按魔数，其次按 Content-Type，再按 URL 后缀，默认 jpg"""
+    fmt = sniff_format(head) if head else None
+    if fmt:
+        return _FORMAT_EXTENSIONS[fmt]
+    ct = (content_type or '').lower()
+    for keyword, ext in _CONTENT_TYPE_EXTENSIONS:
+        if keyword in ct:
+            return ext
+    return url_extension(url) or 'jpg'
@@ -0,0 +1,122 @@
+import base64
+from urllib.parse import quote, unquote
+
+# 代理请求上游时使用的浏览器头（小红书等站点需要较完整的头）
+# 图片本身已是压缩格式，要求上游不做传输压缩，便于原样透传 Content-Length
+PROXY_HEADERS = {
+    'Referer': 'https://www.xiaohongshu.com/',
+    'Origin': 'https://www.xiaohongshu.com',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'identity',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache',
+    'Sec-Fetch-Dest': 'image',
+    'Sec-Fetch-Mode': 'no-cors',
+    'Sec-Fetch-Site': 'cross-site',
+}
+
+# /download 请求上游时附加的头：沿用会话默认头，不带小红书的 Referer/Origin（其他站点的防盗链会拒绝），
+# 同样要求不做传输压缩
+DOWNLOAD_HEADERS = {
+    'Accept-Encoding': 'identity',
+}
+
+# 原样透传给客户端的上游响应头
+PASSTHROUGH_HEADERS = ('Content-Type', 'Content-Length', 'ETag', 'Last-Modified')
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+class ProxyTooLarge(Exception):
+    """上游图片超过代理允许的大小"""
+
+
+def decode_proxy_url(raw):
+    """解析 /proxy_image 的 url 参数：先尝试 base64 + URL 解码，失败则只做 URL 解码；
+    补全协议并强制使用 HTTPS（解决 Mixed Content 问题）"""
+    try:
+        image_url = unquote(base64.b64decode(raw).decode('utf-8'))
+    except Exception:
+        image_url = unquote(raw)
+
+    if not image_url.startswith(('http://', 'https://')):
+        image_url = 'https://' + image_url
+    if image_url.startswith('http://'):
+        image_url = image_url.replace('http://', 'https://', 1)
+    return image_url
+
+
+def encode_proxy_url(url):
+    """与前端 btoa(encodeURIComponent(url)) 等价的编码，供页面生成代理/缩略图链接"""
+    return base64.b64encode(quote(url, safe="-_.!~*'()").encode('ascii')).decode('ascii')
+
+
+def open_upstream(session, url, headers=None, timeout=15, max_bytes=DEFAULT_MAX_BYTES, base_headers=PROXY_HEADERS):
+    """以流式方式请求上游图片，返回尚未读取正文的响应
+
+    base_headers 为基础请求头（默认 PROXY_HEADERS），headers 在其上追加（如条件请求头）。
+    声明的 Content-Length 超过 max_bytes 时直接放弃，抛出 ProxyTooLarge。
+    """
+    request_headers = dict(base_headers)
+    if headers:
+        request_headers.update(headers)
+    response = session.get(url, headers=request_headers, timeout=timeout, allow_redirects=True, stream=True)
+    try:
+        response.raise_for_status()
+        length = response.headers.get('Content-Length')
+        if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+            raise ProxyTooLarge(f'图片过大: {length} 字节')
+    except Exception:
+        response.close()
+        raise
+    return response
+
+
+def passthrough_headers(response):
+    """挑出需要透传的上游响应头；上游仍做了传输压缩时不透传 Content-Length"""
+    headers = {}
+    for name in PASSTHROUGH_HEADERS:
+        value = response.headers.get(name)
+        if value:
+            headers[name] = value
+    encoding = (response.headers.get('Content-Encoding') or 'identity').lower()
+    if encoding != 'identity':
+        headers.pop('Content-Length', None)
+    headers.setdefault('Content-Type', 'image/jpeg')
+    return headers
+
+
+def peek_body(chunks):
+    """先读取第一块正文，返回 (第一块, 从第一块开始的完整正文生成器)；用于在转发前检查正文开头"""
+    first = next(chunks, b'')
+
+    def body():
+        try:
+            if first:
+                yield first
+            yield from chunks
+        finally:
+            chunks.close()
+    return first, body()
+
+
+def iter_body(response, max_bytes=DEFAULT_MAX_BYTES, chunk_size=DEFAULT_CHUNK_SIZE):
+    """逐块产出上游正文；结束时关闭上游连接
+
+    累计超过 max_bytes 时抛出 ProxyTooLarge：响应头已发出时 WSGI 服务器会中断连接，
+    客户端看到的是传输失败而不是一张被截断的图片。
+    """
+    total = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise ProxyTooLarge(f'图片超过 {max_bytes} 字节')
+            yield chunk
+    finally:
+        response.close()
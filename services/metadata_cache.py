@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url):
+    """规范化 URL：协议与主机小写、去掉默认端口和 fragment；query 保持原样（签名 URL 依赖它）"""
+    try:
+        parts = urlsplit(url.strip())
+    except Exception:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def referer_class(referer=None, cookie=None):
+    """防盗链通常只看 Referer 的主机；带 Cookie 的请求单独归类"""
+    host = ''
+    if referer:
+        try:
+            host = urlsplit(referer).netloc.lower()
+        except Exception:
+            host = ''
+    return host + ('+cookie' if cookie else '')
+
+
+class ImageMetaCache:
+    """图片元数据缓存：内存 LRU + 可选的 SQLite 磁盘层
+
+    条目内容：{'info': 验证/尺寸信息, 'etag', 'last_modified', 'expires_at'}。
+    过期但带有 ETag/Last-Modified 的条目仍会返回（fresh=False），供调用方发起条件请求。
+    """
+
+    def __init__(self, max_entries=5000, ttl=24 * 3600, negative_ttl=600,
+                 db_path=None, max_disk_entries=200000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        if db_path:
+            self._open_db(db_path)
+
+    @staticmethod
+    def make_key(url, referer=None, cookie=None):
+        return f'{normalize_url(url)}|{referer_class(referer, cookie)}'
+
+    def _open_db(self, db_path):
+        try:
+            db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS image_meta ('
+                ' key TEXT PRIMARY KEY, info TEXT NOT NULL, etag TEXT, last_modified TEXT,'
+                ' expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS idx_image_meta_accessed ON image_meta(accessed_at)')
+            db.commit()
+            self._db = db
+        except (sqlite3.Error, OSError):
+            # 只读文件系统（如 Vercel）上只使用内存层
+            self._db = None
+
+    def get(self, key):
+        """返回 (entry, fresh)；未命中或已过期且无法重新验证时返回 (None, False)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            return None, False
+        if entry['expires_at'] > now:
+            return entry, True
+        if entry.get('etag') or entry.get('last_modified'):
+            return entry, False
+        return None, False
+
+    def put(self, key, info, etag=None, last_modified=None):
+        ttl = self.ttl if info.get('valid') else self.negative_ttl
+        entry = {
+            'info': dict(info),
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': time.time() + ttl,
+        }
+        self._remember(key, entry)
+        self._store(key, entry)
+        return entry
+
+    def refresh(self, key, entry):
+        """条件请求返回 304 后延长条目有效期"""
+        return self.put(key, entry['info'], entry.get('etag'), entry.get('last_modified'))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute('DELETE FROM image_meta')
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT info, etag, last_modified, expires_at FROM image_meta WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._db.execute('UPDATE image_meta SET accessed_at = ? WHERE key = ?', (time.time(), key))
+                self._db.commit()
+        except sqlite3.Error:
+            return None
+        return {
+            'info': json.loads(row[0]),
+            'etag': row[1],
+            'last_modified': row[2],
+            'expires_at': row[3],
+        }
+
+    def _store(self, key, entry):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO image_meta (key, info, etag, last_modified, expires_at, accessed_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, json.dumps(entry['info']), entry['etag'], entry['last_modified'],
+                     entry['expires_at'], time.time())
+                )
+                self._writes += 1
+                # 每写入一批检查一次容量，按最近访问时间淘汰
+                if self._writes % 500 == 0:
+                    self._db.execute(
+                        'DELETE FROM image_meta WHERE key IN ('
+                        ' SELECT key FROM image_meta ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                        (self.max_disk_entries,)
+                    )
+                self._db.commit()
+        except sqlite3.Error:
+            pass
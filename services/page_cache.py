@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class FetchedPage:
+    """抓取到的页面：缓存条目与新响应统一成同一种结构
+
+    cache_status 为 'MISS'（新抓取）、'HIT'（缓存未过期）或 'REVALIDATED'（条件请求返回 304）。
+    """
+
+    __slots__ = ('url', 'status_code', 'content', 'encoding', 'content_type',
+                 'etag', 'last_modified', 'cache_status')
+
+    def __init__(self, url, status_code, content, encoding=None, content_type='',
+                 etag=None, last_modified=None, cache_status='MISS'):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_status = cache_status
+
+    @classmethod
+    def from_response(cls, url, response):
+        return cls(
+            url,
+            response.status_code,
+            response.content,
+            encoding=response.encoding,
+            content_type=response.headers.get('content-type', '').lower(),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+    def text(self):
+        """按响应声明的编码解码，失败时按 UTF-8 忽略错误解码"""
+        if self.encoding:
+            try:
+                return self.content.decode(self.encoding)
+            except (LookupError, UnicodeDecodeError):
+                pass
+        return self.content.decode('utf-8', errors='ignore')
+
+    def copy(self, cache_status):
+        return FetchedPage(self.url, self.status_code, self.content, self.encoding, self.content_type,
+                           self.etag, self.last_modified, cache_status)
+
+
+class PageCache:
+    """已抓取 HTML 的短期缓存
+
+    - 键为 URL + Cookie 的哈希（不同登录态的页面分开缓存，Cookie 本身不保存为键）
+    - ttl 秒内直接复用；过期后如有 ETag/Last-Modified，在 stale_ttl 秒内仍保留，供条件请求续期
+    - 内存 LRU，最多 max_entries 个页面，单页超过 max_page_bytes 不缓存
+    """
+
+    def __init__(self, max_entries=100, ttl=60, stale_ttl=600, max_page_bytes=5 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_page_bytes = max_page_bytes
+        self._entries = OrderedDict()   # key -> (page, fetched_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, cookie=None):
+        cookie_hash = hashlib.sha256(cookie.encode('utf-8')).hexdigest()[:16] if cookie else ''
+        return f'{url}|{cookie_hash}'
+
+    def get(self, key):
+        """返回 (page, fresh)；未命中或已无法续期时返回 (None, False)"""
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None, False
+            page, fetched_at = item
+            age = now - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                return page, True
+            if age < self.stale_ttl and (page.etag or page.last_modified):
+                return page, False
+            del self._entries[key]
+            return None, False
+
+    def put(self, key, page):
+        if page.status_code != 200 or len(page.content) > self.max_page_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (page, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key):
+        """条件请求返回 304 后续期"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries[key] = (item[0], time.time())
+                self._entries.move_to_end(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+
+from services.http_pool import HostLimitTimeout, request_deadline
+
+# 读取正文时每次最多读取的字节数
+BODY_CHUNK_SIZE = 64 * 1024
+
+# 可以换一种请求头再试的状态码；其余 4xx（如 404）直接交给调用方处理
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+# 请求头方案：0 标准请求；1 补充更多浏览器头；2 换用 Windows 的 User-Agent
+HEADER_PROFILES = [
+    {},
+    {
+        'Referer': 'https://www.google.com/',
+        'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"macOS"',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    },
+]
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """主机熔断中，直接失败"""
+
+
+class CircuitBreaker:
+    """按主机的熔断器
+
+    连续 failure_threshold 次超时或连接失败后熔断 reset_timeout 秒，期间请求直接失败；
+    到期后放行一个试探请求（半开），成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._hosts = {}   # host -> {'failures', 'opened_at', 'probing'}
+
+    def allow(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened_at'] is None:
+                return True
+            if time.monotonic() - state['opened_at'] < self.reset_timeout or state['probing']:
+                return False
+            state['probing'] = True
+            return True
+
+    def release(self, host):
+        """请求没有真正发出（如本地排队超时）：放弃本次半开试探，不计成功也不计失败"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state['probing'] = False
+
+    def record_success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened_at': None, 'probing': False})
+            state['failures'] += 1
+            if state['probing'] or state['failures'] >= self.failure_threshold:
+                state['opened_at'] = time.monotonic()
+                state['probing'] = False
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    'failures': state['failures'],
+                    'open': state['opened_at'] is not None,
+                    'retry_in': (round(max(0.0, self.reset_timeout - (now - state['opened_at'])), 1)
+                                 if state['opened_at'] is not None else 0),
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+class PageFetcher:
+    """页面抓取的重试引擎
+
+    - 总截止时间：所有尝试（含退避等待、排队等待并发名额与读取正文）在 deadline 秒内完成，
+      每次请求的超时不超过剩余时间
+    - 连接超时与读取超时分开设置
+    - 指数退避 + 全抖动：第 n 次重试前等待 uniform(0, min(backoff_max, backoff_base * 2^n)) 秒
+    - 熔断：同一主机连续请求失败达到阈值后，在一段时间内直接失败
+    - 记住每个主机上次成功的请求头方案，下次优先使用
+    """
+
+    def __init__(self, session, deadline=20.0, connect_timeout=5.0, read_timeout=10.0,
+                 backoff_base=0.5, backoff_max=4.0, breaker=None):
+        self.session = session
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._profiles = {}   # host -> 上次成功的方案序号
+        self._lock = threading.Lock()
+
+    def _profile_order(self, host):
+        with self._lock:
+            preferred = self._profiles.get(host, 0)
+        return [preferred] + [i for i in range(len(HEADER_PROFILES)) if i != preferred]
+
+    def _remember(self, host, profile):
+        with self._lock:
+            self._profiles[host] = profile
+
+    def _headers(self, profile, cookie=None, extra=None):
+        headers = self.session.headers.copy()
+        headers.update(HEADER_PROFILES[profile])
+        if cookie:
+            headers['Cookie'] = cookie
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def _read_body(self, response, expires_at):
+        """读取完整正文，超过截止时间时断开连接并抛出 Timeout
+
+        读取超时只限制每次 socket 读取，持续缓慢返回的正文需要在这里按总截止时间中断；
+        urllib3 2.x 用 read1() 读取已到达的数据，不等凑满整块。
+        """
+        raw = response.raw
+        read1 = getattr(raw, 'read1', None)
+        if read1 is not None:
+            def chunks():
+                while True:
+                    try:
+                        data = read1(BODY_CHUNK_SIZE, decode_content=True)
+                    except urllib3.exceptions.HTTPError as e:
+                        raise requests.exceptions.ConnectionError(e, response=response)
+                    if not data:
+                        return
+                    yield data
+        else:
+            def chunks():
+                return response.iter_content(chunk_size=8 * 1024)
+
+        body = []
+        try:
+            for chunk in chunks():
+                body.append(chunk)
+                if time.monotonic() > expires_at:
+                    raise requests.exceptions.Timeout(f'读取正文超时（{self.deadline:g} 秒）')
+        except Exception:
+            response.close()
+            raise
+        response._content = b''.join(body)
+        response._content_consumed = True
+
+    def fetch(self, url, cookie=None, headers=None):
+        """依次用各请求头方案抓取页面
+
+        返回首个 200 响应，或不值得重试的响应（如 404、304）；所有方案都被拒绝时返回最后一个响应；
+        都未能得到响应时抛出最后一个异常。
+        """
+        host = urlsplit(url).netloc.lower()
+        expires_at = time.monotonic() + self.deadline
+        last_response = None
+        last_error = None
+
+        for attempt, profile in enumerate(self._profile_order(host)):
+            if attempt:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+                if time.monotonic() + delay >= expires_at:
+                    break
+                time.sleep(delay)
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self.breaker.allow(host):
+                raise CircuitOpenError(f'{host} 连续请求失败，暂停访问，请稍后再试')
+
+            timeout = (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+            try:
+                with request_deadline(expires_at):
+                    response = self.session.get(url, headers=self._headers(profile, cookie, headers),
+                                                timeout=timeout, stream=True)
+                self._read_body(response, expires_at)
+            except HostLimitTimeout as e:
+                # 本地并发名额排队超时，与上游是否健康无关
+                self.breaker.release(host)
+                last_error = e
+                continue
+            except requests.exceptions.RequestException as e:
+                # 超时、连接失败以及重定向过多、正文传输中断等都计为一次失败；
+                # 半开试探因此失败时重新熔断，不会一直停在试探状态
+                self.breaker.record_failure(host)
+                last_error = e
+                continue
+
+            self.breaker.record_success(host)
+            if response.status_code == 200:
+                self._remember(host, profile)
+                return response
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            last_response = response
+
+        if last_response is not None:
+            return last_response
+        if last_error is not None:
+            raise last_error
+        raise requests.exceptions.Timeout(f'请求超时（{self.deadline:g} 秒）')
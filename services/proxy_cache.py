@@ -0,0 +1,188 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import time
+from pathlib import Path
+
+from services.disk_store import DiskStore, unlink_quietly
+from services.image_header import extension_for, is_image_content
+from services.image_proxy import peek_body
+
+_BODY_NAME = re.compile(r'^[0-9a-f]{16}\.[0-9a-z]+$')
+
+
+class ProxyCache:
+    """/proxy_image 的磁盘内容缓存
+
+    - 正文按内容寻址保存为 <sha256 前 16 位>.<扩展名>（与 static/captured 相同的命名），
+      不同 URL 指向相同内容时只存一份；写入、LRU 淘汰与总大小限制（max_bytes）由 DiskStore 负责
+    - 每个 URL 一个元数据文件 meta/<sha256(url)>.json，记录正文文件、类型、ETag/Last-Modified、过期时间；
+      每次查询都读元数据文件，多进程之间的写入与续期互相可见
+    - 正文被淘汰后，对应的元数据在下次查询时删除
+    - 过期条目仍保留，供调用方向上游发起条件请求后续期
+    - 只缓存图片（Content-Type 为 image/* 或正文魔数是图片），错误页、登录页等原样转发但不缓存
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, ttl=24 * 3600):
+        self.root = Path(root)
+        self.meta_dir = self.root / 'meta'
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = DiskStore(self.root, max_bytes, match=lambda name: _BODY_NAME.match(name) is not None)
+        try:
+            self.meta_dir.mkdir(parents=True, exist_ok=True)
+            self.enabled = self.store.enabled
+        except (OSError, PermissionError):
+            # 只读文件系统（如 Vercel）上不启用缓存
+            self.enabled = False
+        if self.enabled:
+            self._load()
+
+    @staticmethod
+    def key_of(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def client_etag(entry):
+        """返回给客户端的 ETag：优先沿用上游的，否则用正文哈希"""
+        return entry.get('etag') or '"%s"' % entry['file'].split('.', 1)[0]
+
+    def path_of(self, entry):
+        return self.store.path(entry['file'])
+
+    def _meta_path(self, key):
+        return self.meta_dir / f'{key}.json'
+
+    def _load(self):
+        """启动时清理元数据：正文已不存在的条目，以及早期版本写入的非图片条目"""
+        referenced, stale_files = set(), set()
+        for path in self.meta_dir.glob('*.json'):
+            try:
+                entry = json.loads(path.read_text('utf-8'))
+            except (OSError, ValueError):
+                continue
+            filename = entry.get('file') or ''
+            if not self.store.path(filename).is_file():
+                unlink_quietly(path)
+            elif not (entry.get('content_type') or '').lower().startswith('image/'):
+                # 早期版本会把错误页等非图片正文也写入缓存
+                unlink_quietly(path)
+                stale_files.add(filename)
+            else:
+                referenced.add(filename)
+        for filename in stale_files - referenced:
+            self.store.discard(filename)
+        self.store.rescan()
+
+    def _read_meta(self, key):
+        try:
+            return json.loads(self._meta_path(key).read_text('utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, entry):
+        # 先写临时文件再替换，其他进程不会读到写了一半的元数据
+        path = self._meta_path(key)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            tmp_path.write_text(json.dumps(entry), 'utf-8')
+            os.replace(tmp_path, path)
+        except OSError:
+            unlink_quietly(tmp_path)
+
+    def get(self, url):
+        """返回 (entry, fresh)；未命中返回 (None, False)"""
+        if not self.enabled:
+            return None, False
+        key = self.key_of(url)
+        entry = self._read_meta(key)
+        if entry is None:
+            return None, False
+        if not self.store.touch(entry['file']):
+            # 正文已被淘汰（可能由其他进程淘汰）
+            unlink_quietly(self._meta_path(key))
+            return None, False
+        return entry, entry['expires_at'] > time.time()
+
+    def refresh(self, url, headers=None):
+        """上游返回 304 后续期条目，并更新上游给出的新校验值"""
+        key = self.key_of(url)
+        entry = self._read_meta(key)
+        if entry is None:
+            return None
+        if headers is not None:
+            entry['etag'] = headers.get('ETag') or entry.get('etag')
+            entry['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+        entry['expires_at'] = time.time() + self.ttl
+        self._write_meta(key, entry)
+        return entry
+
+    def tee(self, url, response, chunks, max_bytes=None):
+        """边向客户端产出正文，边写入临时文件；正文完整时写入缓存
+
+        正文被截断（超过 max_bytes 或与 Content-Length 不符）或客户端中途断开时丢弃临时文件；
+        正文不是图片时只转发，不写缓存。
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        first, chunks = peek_body(chunks)
+        if not is_image_content(response.headers.get('Content-Type'), first):
+            yield from chunks
+            return
+        try:
+            fd, tmp_path = self.store.mkstemp()
+        except OSError:
+            yield from chunks
+            return
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    size += len(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            chunks.close()
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) != size:
+                complete = False
+            if max_bytes and size > max_bytes:
+                complete = False
+            if complete and size:
+                self._store(url, tmp_path, digest.hexdigest(), head, size, response.headers)
+            else:
+                unlink_quietly(tmp_path)
+
+    def _store(self, url, tmp_path, digest, head, size, headers):
+        content_type = headers.get('Content-Type') or ''
+        extension = extension_for(content_type, head, url)
+        if not content_type.lower().startswith('image/'):
+            # 按魔数判定为图片、但上游没有给出图片类型时，按实际格式补上
+            content_type = mimetypes.guess_type(f'image.{extension}')[0] or 'application/octet-stream'
+        filename = f'{digest[:16]}.{extension}'
+        if self.store.commit(tmp_path, filename) is None:
+            return
+        self._write_meta(self.key_of(url), {
+            'url': url,
+            'file': filename,
+            'content_type': content_type,
+            'size': size,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires_at': time.time() + self.ttl,
+        })
+
+    def clear(self):
+        self.store.clear()
+        for path in self.meta_dir.glob('*.json'):
+            unlink_quietly(path)
@@ -0,0 +1,219 @@
+import time
+from contextlib import contextmanager
+
+# 注入页面的活动监测脚本：MutationObserver 记录最近一次 DOM 变化，
+# IntersectionObserver 跟踪进入视口（含 200px 余量）的 <img>，用于统计尚未加载完成的可见图片
+ACTIVITY_SCRIPT = """
+(() => {
+  if (window.__renderActivity) return;
+  const state = { lastMutation: performance.now(), mutations: 0 };
+  const visible = new Set();
+  const io = new IntersectionObserver(entries => {
+    for (const e of entries) {
+      if (e.isIntersecting) visible.add(e.target); else visible.delete(e.target);
+    }
+  }, { rootMargin: '200px' });
+  const watch = (node) => {
+    if (node.tagName === 'IMG') io.observe(node);
+    if (node.querySelectorAll) node.querySelectorAll('img').forEach(img => io.observe(img));
+  };
+  const mo = new MutationObserver(records => {
+    state.mutations += records.length;
+    state.lastMutation = performance.now();
+    for (const r of records) {
+      r.addedNodes.forEach(n => { if (n.nodeType === 1) watch(n); });
+    }
+  });
+  // 只关心节点增删与图片地址变化；class/style 动画（轮播等）不算页面仍在加载
+  mo.observe(document, { childList: true, subtree: true, attributes: true,
+                         attributeFilter: ['src', 'srcset', 'data-src', 'poster'] });
+  window.__renderActivity = {
+    snapshot() {
+      let pending = 0;
+      visible.forEach(img => {
+        if (!img.isConnected) visible.delete(img);
+        else if (!img.complete) pending++;
+      });
+      const doc = document.scrollingElement || document.documentElement;
+      return {
+        idleMs: performance.now() - state.lastMutation,
+        mutations: state.mutations,
+        pendingImages: pending,
+        height: doc ? doc.scrollHeight : 0,
+        atBottom: doc ? window.scrollY + window.innerHeight >= doc.scrollHeight - 2 : true
+      };
+    }
+  };
+})();
+"""
+
+# 会触发懒加载内容的请求类型
+TRACKED_RESOURCE_TYPES = {'image', 'xhr', 'fetch'}
+
+LOAD_MORE_SELECTOR = 'text=/加载更多|查看更多|更多|展开|Load more|More|Show more/i'
+
+
+class PhaseTimer:
+    """记录各阶段耗时（毫秒），用于 debug 输出"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def record(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0) + round(seconds * 1000)
+
+
+class PageActivity:
+    """页面加载活动监测：网络侧跟踪进行中的图片/XHR 请求，页面侧读取 DOM 变化与可见图片的加载状态
+
+    - quiet_ms：网络与 DOM 都至少静默这么久才算稳定
+    - stale_ms：进行中超过这么久的请求（长轮询、流式请求）不再阻塞稳定判定
+    - poll_ms：轮询间隔；等待期间 Playwright 照常分发网络事件
+    """
+
+    def __init__(self, page, quiet_ms=300, stale_ms=5000, poll_ms=100):
+        self.page = page
+        self.quiet_ms = quiet_ms
+        self.stale_ms = stale_ms
+        self.poll_ms = poll_ms
+        self._inflight = {}   # request -> 开始时间
+        self.last_network = time.monotonic()
+        self.requests_seen = 0
+        page.add_init_script(ACTIVITY_SCRIPT)
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_done)
+        page.on('requestfailed', self._on_done)
+
+    def _on_request(self, request):
+        try:
+            if request.resource_type not in TRACKED_RESOURCE_TYPES:
+                return
+        except Exception:
+            return
+        self._inflight[request] = time.monotonic()
+        self.requests_seen += 1
+        self.last_network = time.monotonic()
+
+    def _on_done(self, request):
+        if self._inflight.pop(request, None) is not None:
+            self.last_network = time.monotonic()
+
+    def inflight(self, now=None):
+        now = now or time.monotonic()
+        limit = self.stale_ms / 1000.0
+        return sum(1 for started in list(self._inflight.values()) if now - started < limit)
+
+    def snapshot(self):
+        try:
+            return self.page.evaluate(
+                '() => window.__renderActivity ? window.__renderActivity.snapshot() : null')
+        except Exception:
+            return None
+
+    def wait_quiet(self, timeout_ms):
+        """等到页面稳定，或超过 timeout_ms；返回 (是否稳定, 最后一次页面快照)
+
+        静默时间从调用时刻起算：刚滚动完时页面的懒加载逻辑可能还没开始请求，不能立即判定稳定。
+        """
+        started = time.monotonic()
+        deadline = started + timeout_ms / 1000.0
+        quiet = self.quiet_ms / 1000.0
+        while True:
+            snap = self.snapshot()
+            now = time.monotonic()
+            elapsed = now - started
+            network_idle = 0.0 if self.inflight(now) else min(elapsed, now - self.last_network)
+            dom_idle = min(elapsed, snap['idleMs'] / 1000.0) if snap else elapsed
+            pending_images = snap['pendingImages'] if snap else 0
+            if network_idle >= quiet and dom_idle >= quiet and not pending_images:
+                return True, snap
+            if now >= deadline:
+                return False, snap
+            try:
+                self.page.wait_for_timeout(min(self.poll_ms, max(1, (deadline - now) * 1000)))
+            except Exception:
+                return False, snap
+
+
+def click_load_more(page, activity, rounds=5, per_round=3, settle_ms=3000):
+    """点击“加载更多/展开”等按钮，每轮点击后等到页面稳定；没有新内容时提前结束，返回点击次数"""
+    clicks = 0
+    for _ in range(rounds):
+        try:
+            candidates = page.locator(LOAD_MORE_SELECTOR)
+            count = candidates.count()
+        except Exception:
+            break
+        before = activity.snapshot()
+        clicked = 0
+        for i in range(count):
+            if clicked >= per_round:
+                break
+            button = candidates.nth(i)
+            try:
+                # 不可见的按钮直接跳过，避免 click() 在它身上等待超时
+                if not button.is_visible():
+                    continue
+                button.click(timeout=1500)
+                clicked += 1
+            except Exception:
+                pass
+        if not clicked:
+            break
+        clicks += clicked
+        _, after = activity.wait_quiet(settle_ms)
+        if before and after and after['mutations'] == before['mutations']:
+            break
+    return clicks
+
+
+def auto_scroll(page, activity, max_scrolls=30, settle_ms=3000):
+    """逐屏向下滚动，每步等到新内容与可见图片加载完成后立即继续
+
+    到达底部且页面高度连续两步不再增长时停止。返回滚动统计。
+    """
+    steps = 0
+    settled = 0
+    same_count = 0
+    last_height = 0
+    for _ in range(max_scrolls):
+        try:
+            page.evaluate('window.scrollBy(0, Math.max(600, window.innerHeight));')
+        except Exception:
+            break
+        steps += 1
+        quiet, snap = activity.wait_quiet(settle_ms)
+        settled += int(quiet)
+        if not snap:
+            continue
+        if snap['atBottom'] and snap['height'] == last_height:
+            same_count += 1
+            if same_count >= 2:
+                break
+        else:
+            same_count = 0
+        last_height = snap['height']
+    return {'steps': steps, 'settled_steps': settled, 'final_height': last_height}
+
+
+def reveal_lazy_images(page, activity, settle_ms=3000):
+    """把懒加载的图片元素依次滚动进视口以触发加载，然后等待稳定"""
+    try:
+        page.evaluate("""
+            () => {
+              const nodes = Array.from(document.querySelectorAll('img, [data-src], [data-original], [data-lazy-src]'));
+              nodes.forEach(el => { try { el.scrollIntoView({behavior:'instant', block:'center'}); } catch(e){} });
+            }
+        """)
+    except Exception:
+        return False
+    quiet, _ = activity.wait_quiet(settle_ms)
+    return quiet
@@ -0,0 +1,131 @@
+from collections import Counter
+from urllib.parse import urlsplit
+
+# 渲染模式默认拦截的资源类型（Playwright 的 resource_type）：字体、音视频、字幕、清单、长连接
+DEFAULT_BLOCK_TYPES = ('font', 'media', 'texttrack', 'manifest', 'eventsource', 'websocket')
+
+# 默认拦截的统计、广告与监控域名（含子域名），任何资源类型都拦截
+DEFAULT_BLOCK_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'googlesyndication.com', 'googleadservices.com',
+    'doubleclick.net', 'adservice.google.com', 'facebook.net', 'connect.facebook.com',
+    'hotjar.com', 'clarity.ms', 'segment.io', 'segment.com', 'mixpanel.com', 'amplitude.com',
+    'scorecardresearch.com', 'quantserve.com', 'amazon-adsystem.com', 'criteo.com', 'criteo.net',
+    'taboola.com', 'outbrain.com', 'bat.bing.com', 'nr-data.net', 'js-agent.newrelic.com',
+    'hm.baidu.com', 'cnzz.com', 'umeng.com', 'mmstat.com', 'growingio.com', 'sensorsdata.cn',
+)
+
+# 始终放行的类型：页面本身
+ALWAYS_ALLOW_TYPES = {'document'}
+
+# 不受 block_types 与第三方脚本规则影响的类型：我们要收集的图片；
+# 但来自 block_domains 的图片（统计像素、广告图）仍然拦截
+TYPE_EXEMPT_TYPES = {'image'}
+
+# 二级域名后缀（如 example.com.cn），用于粗略判断“同站”
+_SECOND_LEVEL = {'com', 'net', 'org', 'gov', 'edu', 'co', 'ac'}
+
+
+def parse_list(value):
+    """逗号分隔的配置转为小写元组"""
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+    return tuple(item.strip().lower() for item in value if item and item.strip())
+
+
+def site_of(host):
+    """主机所属的站点（可注册域名的近似）：a.b.example.com -> example.com，x.example.com.cn -> example.com.cn"""
+    labels = (host or '').lower().rstrip('.').split('.')
+    if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL and len(labels[-1]) == 2:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def _matches(host, domains):
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+
+class RequestStats:
+    """单次渲染中的放行与拦截计数"""
+
+    def __init__(self):
+        self.allowed = Counter()           # resource_type -> 次数
+        self.blocked = Counter()           # resource_type -> 次数
+        self.blocked_hosts = Counter()     # host -> 次数
+
+    def as_dict(self, top_hosts=10):
+        return {
+            'allowed': sum(self.allowed.values()),
+            'blocked': sum(self.blocked.values()),
+            'allowed_by_type': dict(self.allowed),
+            'blocked_by_type': dict(self.blocked),
+            'blocked_hosts': dict(self.blocked_hosts.most_common(top_hosts)),
+        }
+
+
+class RequestPolicy:
+    """渲染模式的请求拦截策略
+
+    判定顺序：页面始终放行 → 命中 allow_domains 放行 → 命中 block_domains 拦截（图片也不例外）
+    → 图片放行 → 资源类型在 block_types 中拦截 → 开启 block_third_party_scripts 时拦截非同站脚本 → 放行。
+    """
+
+    def __init__(self, block_types=DEFAULT_BLOCK_TYPES, block_domains=DEFAULT_BLOCK_DOMAINS,
+                 allow_domains=(), block_third_party_scripts=False):
+        self.block_types = set(parse_list(block_types))
+        self.block_domains = parse_list(block_domains)
+        self.allow_domains = parse_list(allow_domains)
+        self.block_third_party_scripts = block_third_party_scripts
+
+    def allows(self, url, resource_type, site=''):
+        if resource_type in ALWAYS_ALLOW_TYPES:
+            return True
+        host = (urlsplit(url).hostname or '').lower()
+        if not host:
+            return True
+        if _matches(host, self.allow_domains):
+            return True
+        if _matches(host, self.block_domains):
+            return False
+        if resource_type in TYPE_EXEMPT_TYPES:
+            return True
+        if resource_type in self.block_types:
+            return False
+        if self.block_third_party_scripts and resource_type == 'script' and site_of(host) != site:
+            return False
+        return True
+
+    def attach(self, page, page_url):
+        """在页面上注册路由，返回本次渲染的 RequestStats；需在导航前调用"""
+        stats = RequestStats()
+        site = site_of(urlsplit(page_url).hostname or '')
+
+        def handle(route, request):
+            resource_type = request.resource_type
+            try:
+                if self.allows(request.url, resource_type, site):
+                    stats.allowed[resource_type] += 1
+                    route.continue_()
+                else:
+                    stats.blocked[resource_type] += 1
+                    stats.blocked_hosts[(urlsplit(request.url).hostname or '').lower()] += 1
+                    route.abort('blockedbyclient')
+            except Exception:
+                # 页面已关闭等情况下路由会失效，忽略即可
+                pass
+
+        page.route('**/*', handle)
+        # page.route 拦截不到 WebSocket；较新的 Playwright 可以单独接管，不连接真实服务器即等于拦截
+        if 'websocket' in self.block_types and hasattr(page, 'route_web_socket'):
+            def handle_ws(ws):
+                stats.blocked['websocket'] += 1
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+            try:
+                page.route_web_socket('**/*', handle_ws)
+            except Exception:
+                pass
+        return stats
@@ -0,0 +1,110 @@
+import re
+
+# 单个 script/style 正文最多扫描的字符数（超大的内联打包脚本只扫描开头部分）
+MAX_SCAN_CHARS = 1024 * 1024
+# 单个正文最多产出的候选 URL 数
+MAX_MATCHES = 5000
+
+_EXT_ALL = r'(?:jpg|jpeg|png|gif|webp|svg|bmp|ico|tiff)'
+_EXT_STD = r'(?:jpg|jpeg|png|gif|webp|svg|bmp)'
+_EXT_THUMB = r'(?:jpg|jpeg|png|gif|webp)'
+
+# 脚本扫描：与原先十个 re.findall 的结果一致（同样的集合与顺序），但只遍历正文三次
+#   http(s):// 开头、直到引号/空白/逗号的一段只切一次，再对这一段套用各类图片 URL 模式；
+#   原模式在同一段内只可能从第一个 http(s):// 处命中，且命中后该段剩余部分不会再命中
+_SCRIPT_URL_RUN = re.compile(r'https?://[^"\s,]+', re.IGNORECASE)
+
+# 对每段 URL 套用原有的各类图片 URL 模式；关键字用于快速跳过不可能命中的模式
+_URL_PATTERNS = [
+    # 标准图片格式
+    (None, re.compile(r'https?://[^"\s,]+\.' + _EXT_ALL, re.IGNORECASE)),
+    # 包含images路径的URL
+    ('images', re.compile(r'https?://[^"\s,]*images[^"\s,]*\.' + _EXT_STD, re.IGNORECASE)),
+    # 特定域名模式
+    ('.itc.cn', re.compile(r'https?://[^"\s,]*\.itc\.cn[^"\s,]*\.' + _EXT_STD, re.IGNORECASE)),
+    ('openai.com', re.compile(r'https?://[^"\s,]*openai\.com[^"\s,]*\.' + _EXT_STD, re.IGNORECASE)),
+    ('doubao.com', re.compile(r'https?://[^"\s,]*doubao\.com[^"\s,]*\.' + _EXT_STD, re.IGNORECASE)),
+    # 缩略图
+    ('thumbnails', re.compile(r'https?://[^"\s,]*thumbnails[^"\s,]*', re.IGNORECASE)),
+    ('thumb', re.compile(r'https?://[^"\s,]*thumb[^"\s,]*\.' + _EXT_THUMB, re.IGNORECASE)),
+    # CDN图片
+    ('cdn', re.compile(r'https?://[^"\s,]*cdn[^"\s,]*\.' + _EXT_STD, re.IGNORECASE)),
+]
+
+# 其余两类独立扫描全文（可与 URL 段重叠，如 http 段里的 data: URL）
+_SCRIPT_PATTERNS = [
+    # 数据URL (base64图片)
+    re.compile(r'data:image/[^;]+;base64,[A-Za-z0-9+/=]+', re.IGNORECASE),
+    # 相对路径图片（连同结尾引号一起匹配，与原模式相同）
+    re.compile(r'["\'][^"\']*\.' + _EXT_STD + r'["\']', re.IGNORECASE),
+]
+
+# CSS：先定位 background / background-image 声明，再取声明值里的所有 url()
+_CSS_BACKGROUND_DECL = re.compile(r'background(?:-image)?\s*:([^;{}]*)', re.IGNORECASE)
+_CSS_URL = re.compile(r'url\(\s*["\']?([^"\')]+?)["\']?\s*\)', re.IGNORECASE)
+
+
+def _guard(text, max_chars):
+    if not text:
+        return ''
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars]
+    return text
+
+
+def scan_script(text, max_chars=MAX_SCAN_CHARS, max_matches=MAX_MATCHES):
+    """扫描脚本正文中的图片 URL，返回去重后的原始字符串列表（未转为绝对地址）"""
+    text = _guard(text, max_chars)
+    # 按模式分组收集，最后按原模式顺序合并，保持与逐个 findall 相同的顺序
+    groups = [[] for _ in range(len(_URL_PATTERNS) + len(_SCRIPT_PATTERNS))]
+    count = 0
+    for run in _SCRIPT_URL_RUN.finditer(text):
+        token = run.group(0)
+        lower = token.lower()
+        for i, (keyword, pattern) in enumerate(_URL_PATTERNS):
+            if keyword is not None and keyword not in lower:
+                continue
+            match = pattern.match(token)
+            if match:
+                groups[i].append(match.group(0))
+                count += 1
+        if count >= max_matches:
+            break
+    for i, pattern in enumerate(_SCRIPT_PATTERNS, len(_URL_PATTERNS)):
+        for match in pattern.finditer(text):
+            if count >= max_matches:
+                break
+            groups[i].append(match.group(0))
+            count += 1
+
+    found = {}
+    for group in groups:
+        for value in group:
+            # 清理URL（移除可能的引号或逗号）
+            value = value.strip('"\'",')
+            if value:
+                found.setdefault(value, None)
+    return list(found)
+
+
+def scan_css_backgrounds(text, max_chars=MAX_SCAN_CHARS, max_matches=MAX_MATCHES):
+    """扫描 CSS 中 background / background-image 声明里的所有 url()"""
+    text = _guard(text, max_chars)
+    found = {}
+    for decl in _CSS_BACKGROUND_DECL.finditer(text):
+        for value in _CSS_URL.findall(decl.group(1)):
+            found.setdefault(value.strip(), None)
+            if len(found) >= max_matches:
+                return list(found)
+    return list(found)
+
+
+def scan_css_urls(text, max_chars=MAX_SCAN_CHARS, max_matches=MAX_MATCHES):
+    """扫描 CSS 中所有 url()（用于外链样式表）"""
+    text = _guard(text, max_chars)
+    found = {}
+    for match in _CSS_URL.finditer(text):
+        found.setdefault(match.group(1).strip(), None)
+        if len(found) >= max_matches:
+            break
+    return list(found)
@@ -0,0 +1,114 @@
+import hashlib
+import io
+
+from PIL import Image, ImageOps
+
+from services.disk_store import DiskStore
+
+MAX_DIMENSION = 2000
+# EXIF 中的 Orientation 标签
+EXIF_ORIENTATION = 0x0112
+DEFAULT_QUALITY = 80
+# 输出格式 -> (PIL 格式名, MIME 类型, 扩展名)
+OUTPUT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _dimension(value):
+    """宽高参数：缺省时返回 None，超过 MAX_DIMENSION 时取上限；不是正整数时抛出 ValueError"""
+    if value is None or value == '':
+        return None
+    value = int(value)
+    if value <= 0:
+        raise ValueError('宽高必须大于 0')
+    return min(value, MAX_DIMENSION)
+
+
+def normalize_params(width=None, height=None, quality=None, fmt=None, accept=''):
+    """整理缩略图参数：宽高必须是正整数，超过 MAX_DIMENSION 时取上限，否则抛出 ValueError；
+    质量限制在 1..95；格式为 webp/jpeg，auto 或缺省时按客户端 Accept 选择。宽高都未给出时返回 None。"""
+    width = _dimension(width)
+    height = _dimension(height)
+    if not width and not height:
+        return None
+    quality = _clamp(int(quality), 1, 95) if quality else DEFAULT_QUALITY
+    fmt = (fmt or 'auto').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt not in OUTPUT_FORMATS:
+        fmt = 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+    return {'width': width, 'height': height, 'quality': quality, 'format': fmt}
+
+
+def render_thumbnail(source, width=None, height=None, quality=DEFAULT_QUALITY, fmt='webp'):
+    """生成缩略图，返回编码后的字节
+
+    按比例缩放到 width x height 的框内（只给一边时另一边按比例），不放大。
+    JPEG 先用 draft() 让解码器直接按 1/2、1/4、1/8 缩小解码，大图缩放开销很低。
+    宽高按 EXIF 方向校正后的显示尺寸计算。
+    """
+    with Image.open(source) as image:
+        # EXIF 方向 5~8 需要旋转 90°，显示尺寸与存储尺寸宽高互换
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+        src_w, src_h = image.size[::-1] if rotated else image.size
+        box_w = width or max(1, round(src_w * height / src_h))
+        box_h = height or max(1, round(src_h * width / src_w))
+        if image.format == 'JPEG':
+            # draft() 作用于存储方向的图像，框也要按存储方向给出
+            image.draft('RGB', (box_h, box_w) if rotated else (box_w, box_h))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((box_w, box_h), Image.LANCZOS)
+
+        pil_format = OUTPUT_FORMATS[fmt][0]
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if pil_format == 'JPEG' or not has_alpha:
+            if has_alpha:
+                # JPEG 不支持透明通道，铺白底
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+        elif image.mode != 'RGBA':
+            image = image.convert('RGBA')
+
+        out = io.BytesIO()
+        options = {'quality': quality}
+        if pil_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+        image.save(out, pil_format, **options)
+        return out.getvalue()
+
+
+class ThumbnailCache:
+    """缩略图变体的磁盘缓存
+
+    变体按 (源图正文文件, 宽, 高, 质量, 格式) 的哈希命名；源图正文按内容寻址，
+    上游图片变化后自然生成新的变体，旧变体随 LRU 淘汰。写入、淘汰与总大小限制由 DiskStore 负责。
+    """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.store = DiskStore(root, max_bytes)
+        self.enabled = self.store.enabled
+
+    @staticmethod
+    def key_of(source_id, params):
+        raw = f"{source_id}|{params['width']}|{params['height']}|{params['quality']}|{params['format']}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, key, fmt):
+        """返回已生成变体的路径，未命中返回 None"""
+        name = f'{key}.{OUTPUT_FORMATS[fmt][2]}'
+        return self.store.path(name) if self.store.touch(name) else None
+
+    def put(self, key, fmt, data):
+        """保存变体并返回路径；缓存不可用时返回 None"""
+        return self.store.write(f'{key}.{OUTPUT_FORMATS[fmt][2]}', data)
@@ -0,0 +1,89 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    """返回 URL 的主机名（小写），无法解析时返回空字符串"""
+    try:
+        return (urlparse(url).netloc or '').lower()
+    except Exception:
+        return ''
+
+
+class ValidationPool:
+    """有界并发的图片验证引擎
+
+    - 全局并发：由共享线程池的 worker 数量限制（跨请求共享）
+    - 单主机并发：每次调用内，同一主机同时在途的任务数不超过 per_host
+    - 截止时间：超过 deadline 秒后不再派发新任务，未完成的任务被丢弃
+    """
+
+    def __init__(self, max_workers=16, per_host=4, deadline=30.0):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.deadline = float(deadline)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='img-validate')
+
+    def iter_results(self, func, urls, deadline=None, payloads=None):
+        """并发执行 func(url)，按完成顺序产出 (index, result)
+
+        传入 payloads 时改为执行 func(payloads[index])，urls 仅用于按主机限流。
+        调用方可以边迭代边消费结果；超时或异常的任务不会被产出。
+        """
+        urls = list(urls)
+        args = urls if payloads is None else list(payloads)
+        if not urls:
+            return
+        deadline = self.deadline if deadline is None else float(deadline)
+        expires_at = time.monotonic() + deadline
+
+        # 按主机分组排队，保持各主机内部的发现顺序
+        pending = {}
+        for index, url in enumerate(urls):
+            pending.setdefault(host_of(url), deque()).append(index)
+        in_flight = {}   # future -> (index, host)
+        host_load = {}   # host -> 在途数量
+
+        def dispatch():
+            for host in list(pending.keys()):
+                queue = pending[host]
+                while queue and len(in_flight) < self.max_workers and host_load.get(host, 0) < self.per_host:
+                    index = queue.popleft()
+                    future = self._executor.submit(func, args[index])
+                    in_flight[future] = (index, host)
+                    host_load[host] = host_load.get(host, 0) + 1
+                if not queue:
+                    del pending[host]
+
+        try:
+            dispatch()
+            while in_flight:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(list(in_flight), timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, host = in_flight.pop(future)
+                    host_load[host] -= 1
+                    try:
+                        result = future.result()
+                    except Exception:
+                        continue
+                    yield index, result
+                if time.monotonic() < expires_at:
+                    dispatch()
+        finally:
+            # 截止或提前结束时，取消尚未开始的任务
+            for future in in_flight:
+                future.cancel()
+
+    def map(self, func, urls, deadline=None):
+        """并发执行 func(url)，按输入顺序返回结果列表；超时或异常的位置为 None"""
+        urls = list(urls)
+        results = [None] * len(urls)
+        for index, result in self.iter_results(func, urls, deadline=deadline):
+            results[index] = result
+        return results
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 导入 app 时会创建缓存目录与数据库，测试中放到临时目录
+_tmp = tempfile.mkdtemp(prefix='app-tests-')
+for name in ('PROXY_CACHE_DIR', 'THUMB_CACHE_DIR'):
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower()))
+for name in ('COLLECT_DB', 'IMAGE_META_CACHE_DB'):
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower() + '.sqlite3'))
@@ -0,0 +1,37 @@
+import os
+import time
+
+from services.disk_store import DiskStore
+
+
+def test_write_and_evict_least_recently_used(tmp_path):
+    store = DiskStore(tmp_path, max_bytes=10)
+    store.write('a', b'1234')
+    store.write('b', b'1234')
+    assert store.touch('a')
+    store.write('c', b'1234')
+    assert sorted(os.listdir(tmp_path)) == ['a', 'c']
+    assert store.stats()['bytes'] == 8
+
+
+def test_size_cap_covers_files_written_by_other_processes(tmp_path):
+    # 两个实例模拟共用同一目录的两个 worker
+    first = DiskStore(tmp_path, max_bytes=10)
+    second = DiskStore(tmp_path, max_bytes=10)
+    first.write('a', b'123456')
+    old = time.time() - 10
+    os.utime(tmp_path / 'a', (old, old))
+    second.write('b', b'123456')
+    assert os.listdir(tmp_path) == ['b']
+    assert not first.touch('a')
+    assert first.touch('b')
+
+
+def test_commit_reuses_existing_file(tmp_path):
+    store = DiskStore(tmp_path, max_bytes=100)
+    store.write('same', b'data')
+    fd, tmp = store.mkstemp()
+    os.close(fd)
+    assert store.commit(tmp, 'same') == tmp_path / 'same'
+    assert os.listdir(tmp_path) == ['same']
+    assert store.stats()['files'] == 1
@@ -0,0 +1,72 @@
+from requests.structures import CaseInsensitiveDict
+
+from app import ContentExtractor
+from services.image_header import needs_more_ranges
+
+SVG = b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg">' + b'<g/>' * 100000 + b'</svg>'
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body
+        self.headers = CaseInsensitiveDict(headers)
+
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RangeSession:
+    """按 Range 返回 206 的假会话，记录收到的请求"""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        start, end = int(start), min(int(end), len(self.body) - 1)
+        self.ranges.append((start, end))
+        return FakeResponse(206, self.body[start:end + 1], {
+            'Content-Type': self.content_type,
+            'Content-Range': f'bytes {start}-{end}/{len(self.body)}',
+        })
+
+
+def test_needs_more_ranges():
+    assert needs_more_ranges(b'\xff\xd8\xff\xe1\x00\x10Exif', 'image/jpeg')
+    assert not needs_more_ranges(SVG[:64], 'image/svg+xml')
+    assert not needs_more_ranges(b'\x00\x00\x00\x1cftypavif', 'image/avif')
+    assert not needs_more_ranges(b'\x00\x01\x02\x03\x04\x05\x06\x07\x08', '')
+
+
+def test_probe_unparseable_format_uses_single_range_request():
+    extractor = ContentExtractor()
+    extractor.session = RangeSession(SVG, 'image/svg+xml')
+    info, meta = extractor._probe_image_info('https://example.com/a.svg', {})
+    assert extractor.session.ranges == [(0, extractor.probe_window - 1)]
+    assert info['valid'] and meta['is_image']
+    assert info['size'] == len(SVG)
+
+
+def test_probe_jpeg_keeps_reading_windows_past_large_exif():
+    # SOI + 一个超过第一个窗口的 APP1 段 + SOF0（100x50）
+    app1 = b'\xff\xe1' + (0xFFF0).to_bytes(2, 'big') + b'\x00' * (0xFFF0 - 2)
+    sof = b'\xff\xc0\x00\x11\x08' + (50).to_bytes(2, 'big') + (100).to_bytes(2, 'big') + b'\x03' + b'\x00' * 9
+    body = b'\xff\xd8' + app1 + app1 + sof + b'\xff\xd9'
+    extractor = ContentExtractor()
+    extractor.session = RangeSession(body, 'image/jpeg')
+    info, _ = extractor._probe_image_info('https://example.com/a.jpg', {})
+    assert len(extractor.session.ranges) > 1
+    assert (info['width'], info['height']) == (100, 50)
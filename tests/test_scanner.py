@@ -0,0 +1,54 @@
+import random
+import re
+
+from services.scanner import scan_script
+
+# 改为单次编译扫描之前，app.py 中逐个 re.findall 的图片URL模式（原样保留，用于对照）
+LEGACY_IMG_PATTERNS = [
+    r'https?://[^"\s,]+\.(?:jpg|jpeg|png|gif|webp|svg|bmp|ico|tiff)',
+    r'https?://[^"\s,]*images[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
+    r'https?://[^"\s,]*\.itc\.cn[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
+    r'https?://[^"\s,]*openai\.com[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
+    r'https?://[^"\s,]*doubao\.com[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
+    r'https?://[^"\s,]*thumbnails[^"\s,]*',
+    r'https?://[^"\s,]*thumb[^"\s,]*\.(?:jpg|jpeg|png|gif|webp)',
+    r'https?://[^"\s,]*cdn[^"\s,]*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)',
+    r'data:image/[^;]+;base64,[A-Za-z0-9+/=]+',
+    r'["\'][^"\']*\.(?:jpg|jpeg|png|gif|webp|svg|bmp)["\']',
+]
+
+FRAGMENTS = [
+    'http://', 'https://', 'HTTP://', 'a.com/', 'images/', 'thumb', 'thumbnails', 'cdn.', 'x.itc.cn/',
+    'openai.com/', 'doubao.com/', '.png', '.JPG', '.jpeg', '.tiff', '.ico', '.gif', '.svg', 'data:image/png;base64,',
+    'iVBOR=', ';', '"', "'", ',', ' ', '\n', '?u=', '/', 'x', 'pic', '=', '(', ')',
+]
+
+
+def legacy_scan(text):
+    found = {}
+    for pattern in LEGACY_IMG_PATTERNS:
+        for value in re.findall(pattern, text, re.IGNORECASE):
+            value = value.strip('"\'",')
+            if value:
+                found.setdefault(value, None)
+    return list(found)
+
+
+def test_matches_legacy_patterns_on_samples():
+    samples = [
+        'var a = "a.png"b.png"c.png";',
+        "var a = ['/img/a.png', 'b.jpg', \"https://cdn.x.com/thumb/1.webp\"];",
+        'load("https://x.com/p?src=data:image/png;base64,iVBORw0KGgo=")',
+        'u = https://x.com/r?u=https://images.y.com/a.png&v=https://z.com/b.gif',
+        'img = "https://a.itc.cn/thumbnails/1", o = https://openai.com/x.JPEG',
+        "s = 'http://doubao.com/a.png' + 'http://x.com/thumb.gif.svg'",
+    ]
+    for text in samples:
+        assert scan_script(text) == legacy_scan(text), text
+
+
+def test_matches_legacy_patterns_fuzzed():
+    rng = random.Random(8)
+    for _ in range(3000):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 30)))
+        assert scan_script(text) == legacy_scan(text), text
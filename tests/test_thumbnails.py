@@ -0,0 +1,35 @@
+import io
+
+from PIL import Image
+
+from services.thumbnails import EXIF_ORIENTATION, render_thumbnail
+
+
+def _rotated_jpeg(size=(4000, 3000), orientation=6):
+    """存储为横图、EXIF 方向要求旋转 90° 显示的 JPEG"""
+    image = Image.new('RGB', size, 'red')
+    exif = image.getexif()
+    exif[EXIF_ORIENTATION] = orientation
+    out = io.BytesIO()
+    image.save(out, 'JPEG', exif=exif.tobytes())
+    return out.getvalue()
+
+
+def _size(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+def test_rotated_jpeg_width_only():
+    data = render_thumbnail(io.BytesIO(_rotated_jpeg()), width=300, fmt='jpeg')
+    assert _size(data) == (300, 400)
+
+
+def test_rotated_jpeg_height_only():
+    data = render_thumbnail(io.BytesIO(_rotated_jpeg(orientation=8)), height=400, fmt='webp')
+    assert _size(data) == (300, 400)
+
+
+def test_unrotated_jpeg_width_only():
+    data = render_thumbnail(io.BytesIO(_rotated_jpeg(orientation=1)), width=300, fmt='jpeg')
+    assert _size(data) == (300, 225)